@@ -0,0 +1,54 @@
+import threading
+
+# Last action seen per symbol; alerts fire only when it changes
+_last_actions = {}
+_lock = threading.Lock()
+
+
+def seed(snapshot):
+    """Sets the baseline from a stored snapshot, so a restart doesn't re-alert known actions."""
+    with _lock:
+        for r in snapshot["results"]:
+            if r["price"]:
+                _last_actions.setdefault(r["symbol"], r["action"])
+
+
+def action_changes(snapshot):
+    """
+    (symbol, previous action, result) for every symbol whose action changed
+    since the committed baseline. Symbols without a baseline and failed
+    analyses (price 0) never alert. The baseline is left as it is until
+    commit() is called, so changes are not lost if sending fails.
+    """
+    changes = []
+    with _lock:
+        for r in snapshot["results"]:
+            if not r["price"]:
+                continue
+            previous = _last_actions.get(r["symbol"])
+            if previous is not None and previous != r["action"]:
+                changes.append((r["symbol"], previous, r))
+    return changes
+
+
+def commit(snapshot):
+    """Makes the snapshot's actions the baseline for the next comparison."""
+    with _lock:
+        for r in snapshot["results"]:
+            if r["price"]:
+                _last_actions[r["symbol"]] = r["action"]
+
+
+def alert_messages(changes, subscribers, allowed):
+    """
+    chat_id -> alert text. Each subscriber gets a single message covering
+    every changed symbol they follow; only chats in `allowed` are included.
+    """
+    lines = {}
+    for symbol, previous, r in changes:
+        line = f"{symbol}: {previous} → {r['action']} ({r['confidence']}%)"
+        for chat_id in subscribers.get(symbol, ()):
+            if chat_id in allowed:
+                lines.setdefault(chat_id, []).append(line)
+
+    return {chat_id: "🔔 SIGNAL CHANGE\n\n" + "\n".join(user_lines) for chat_id, user_lines in lines.items()}
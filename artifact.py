@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
+
+# Compact model artifact (.mfm): a StandardScaler + RandomForestClassifier
+# pipeline stored as flat arrays that are memory-mapped on load.
+#
+#   8 bytes   magic b"MFMODEL1"
+#   8 bytes   header length (little-endian uint64)
+#   n bytes   JSON header: format version, feature columns, training window,
+#             precision, array directory (dtype/shape/offset), payload sha256
+#   ...       arrays, each aligned to 64 bytes
+#
+# Trees are stored as concatenated node arrays with child indices already
+# offset into the global node array, so all trees are walked together.
+
+MAGIC = b"MFMODEL1"
+FORMAT_VERSION = 1
+ALIGN = 64
+PRECISIONS = {"float64": ("<f8", "<f8"), "float32": ("<f4", "<f4")}  # threshold, leaf value
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class CompactModel:
+    """predict_proba-compatible stand-in for the trained sklearn pipeline."""
+
+    def __init__(self, header, arrays):
+        self.header = header
+        self.feature_cols = header["feature_cols"]
+        self.classes_ = np.array(header["classes"])
+        self.mean = arrays["scaler_mean"]
+        self.scale = arrays["scaler_scale"]
+        self.roots = arrays["roots"]
+        self.left = arrays["children_left"]
+        self.right = arrays["children_right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.value = arrays["value"]
+
+    def predict_proba(self, X):
+        if hasattr(X, "columns"):
+            X = X[self.feature_cols].to_numpy()
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+
+        # Same arithmetic as StandardScaler, then float32 as sklearn trees use
+        X = ((X - self.mean) / self.scale).astype(np.float32)
+
+        rows = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)  # (n_trees, n_samples)
+        while True:
+            left = self.left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+
+        return self.value[nodes].astype(np.float64).mean(axis=0)
+
+
+def save_artifact(pipeline, path, feature_cols, training_window=None, precision="float64"):
+    """Writes `pipeline` as a compact artifact; the file is replaced atomically."""
+    threshold_dtype, value_dtype = PRECISIONS[precision]
+    scaler = pipeline.named_steps["scaler"]
+    forest = pipeline.named_steps["model"]
+
+    roots, lefts, rights, features, thresholds, values = [], [], [], [], [], []
+    offset = 0
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+
+        roots.append(offset)
+        lefts.append(np.where(is_leaf, -1, left + offset))
+        rights.append(np.where(is_leaf, -1, right + offset))
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(tree.threshold)
+        value = tree.value[:, 0, :]
+        values.append(value / value.sum(axis=1, keepdims=True))
+        offset += tree.node_count
+
+    arrays = {
+        "scaler_mean": np.asarray(scaler.mean_, dtype="<f8"),
+        "scaler_scale": np.asarray(scaler.scale_, dtype="<f8"),
+        "roots": np.asarray(roots, dtype="<i4"),
+        "children_left": np.concatenate(lefts).astype("<i4"),
+        "children_right": np.concatenate(rights).astype("<i4"),
+        "feature": np.concatenate(features).astype("<i4"),
+        "threshold": np.concatenate(thresholds).astype(threshold_dtype),
+        "value": np.concatenate(values).astype(value_dtype),
+    }
+
+    directory = {}
+    payload_offset = 0
+    for name, array in arrays.items():
+        directory[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": payload_offset}
+        payload_offset = _align(payload_offset + array.nbytes)
+
+    payload = bytearray(payload_offset)
+    for name, array in arrays.items():
+        start = directory[name]["offset"]
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "feature_cols": list(feature_cols),
+        "classes": [int(c) for c in forest.classes_],
+        "n_trees": len(forest.estimators_),
+        "n_nodes": offset,
+        "precision": precision,
+        "training_window": training_window or {},
+        "created_at": time.time(),
+        "arrays": directory,
+        "sha256": hashlib.sha256(payload).hexdigest(),
+    }
+    header_bytes = json.dumps(header).encode()
+    header_bytes += b" " * (_align(16 + len(header_bytes)) - 16 - len(header_bytes))
+
+    # A temp file unique to this writer, so concurrent trainings of the same
+    # model (threads or processes) never write into each other's file
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header_bytes)).tobytes())
+            f.write(header_bytes)
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return header
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        if f.read(8) != MAGIC:
+            raise ValueError(f"{path} is not a model artifact")
+        length = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+        return json.loads(f.read(length)), 16 + length
+
+
+def load_artifact(path, verify=False):
+    """
+    Loads an artifact with every array memory-mapped (read-only, shared
+    between processes). verify=True checks the payload checksum first.
+    """
+    header, data_start = read_header(path)
+    if header["format_version"] > FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format version {header['format_version']}")
+
+    buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    if verify and hashlib.sha256(buffer[data_start:]).hexdigest() != header["sha256"]:
+        raise ValueError(f"Checksum mismatch for {path}")
+
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"]))
+        start = data_start + spec["offset"]
+        arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
+    return CompactModel(header, arrays)
@@ -1,55 +1,156 @@
-import ccxt
-import pandas as pd
-import ta
+import numpy as np
+from candles import timeframe_ms
+from config import ML_WEIGHT, STRATEGY_WEIGHT, THRESHOLD_BUY, THRESHOLD_SELL
+from features import FEATURE_COLS, INDICATOR_COLS, get_features
+from metrics import timed
+from ml_model import load_or_train, training_end
+from strategy import hybrid_confidence, technical_scores
 
-exchange = ccxt.binance()
+YEAR_MS = 365 * 24 * 3600 * 1000
 
-def backtest(symbol, timeframe="4h", limit=3000):
-    df = pd.DataFrame(
-        exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit),
-        columns=["time","open","high","low","close","volume"]
-    )
 
-    df["EMA20"] = ta.trend.ema_indicator(df["close"], 20)
-    df["EMA50"] = ta.trend.ema_indicator(df["close"], 50)
-    df["RSI"] = ta.momentum.rsi(df["close"], 14)
-    df["MACD"] = ta.trend.macd(df["close"])
-
-    wins = 0
-    losses = 0
-    trades = 0
-
-    for i in range(50, len(df) - 1):
-        row = df.iloc[i]
-        next_row = df.iloc[i + 1]
-
-        score = 0
-        if row["EMA20"] > row["EMA50"]:
-            score += 1
-        if row["close"] > row["EMA20"]:
-            score += 1
-        if row["RSI"] > 50:
-            score += 1
-        if row["MACD"] > 0:
-            score += 1
-
-        # Only strong signals
-        if score >= 3:
-            trades += 1
-            entry = row["close"]
-            exit_price = next_row["close"]
-
-            if exit_price > entry:
-                wins += 1
-            else:
-                losses += 1
+# ================= ENGINE =================
+
+def run_backtest(close, position, timeframe="4h"):
+    """
+    Vectorized one-candle-holding backtest.
+    position[i] is +1 (long), -1 (short) or 0 (flat) for a trade entered at
+    close[i] and exited at close[i + 1]; the last candle can't be traded.
+    Returns trade counts plus PnL (%), max drawdown (%), annualized Sharpe and
+    exposure (% of candles in a trade).
+    """
+    close = np.asarray(close, dtype=float)
+    position = np.asarray(position, dtype=float)[:-1]
+
+    if len(close) < 2:
+        returns = np.zeros(0)
+    else:
+        returns = position * (close[1:] / close[:-1] - 1)
 
+    in_trade = position != 0
+    trades = int(in_trade.sum())
+    wins = int((returns[in_trade] > 0).sum())
+    losses = trades - wins
     winrate = round((wins / trades) * 100, 2) if trades > 0 else 0
 
+    equity = np.cumprod(1 + returns)
+    if len(equity):
+        # Peak equity includes the starting capital of 1.0
+        peak = np.maximum.accumulate(np.maximum(equity, 1.0))
+        drawdown = 1 - equity / peak
+        max_drawdown = float(drawdown.max())
+        pnl = float(equity[-1] - 1)
+    else:
+        max_drawdown = pnl = 0.0
+
+    std = returns.std() if len(returns) else 0.0
+    periods_per_year = YEAR_MS / timeframe_ms(timeframe)
+    sharpe = float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0
+
     return {
-        "symbol": symbol,
         "trades": trades,
         "wins": wins,
         "losses": losses,
-        "winrate": winrate
-    }
\ No newline at end of file
+        "winrate": winrate,
+        "pnl": round(pnl * 100, 2),
+        "max_drawdown": round(max_drawdown * 100, 2),
+        "sharpe": round(sharpe, 2),
+        "exposure": round(in_trade.mean() * 100, 2) if len(in_trade) else 0,
+    }
+
+
+# ================= SIMPLE STRATEGY =================
+
+def simple_scores(df):
+    """4-indicator trend score (0 to 4) for every candle."""
+    close = df["close"].to_numpy()
+    return (
+        (df["EMA20"].to_numpy() > df["EMA50"].to_numpy()).astype(int)
+        + (close > df["EMA20"].to_numpy())
+        + (df["RSI"].to_numpy() > 50)
+        + (df["MACD"].to_numpy() > 0)
+    )
+
+
+@timed("backtest")
+def backtest(symbol, timeframe="4h", limit=3000):
+    df = get_features(symbol, timeframe, limit)
+
+    if df.empty:
+        position = close = np.zeros(0)
+    else:
+        close = df["close"].to_numpy()
+        # Only strong signals, after indicators have warmed up
+        position = (simple_scores(df) >= 3).astype(int)
+        position[:50] = 0
+
+    return {"symbol": symbol, **run_backtest(close, position, timeframe)}
+
+
+# ================= HYBRID STRATEGY =================
+
+def hybrid_inputs(symbol, timeframe="1h", limit=3000, background=True):
+    """
+    Per-candle inputs of strategy.analyze_symbol over history: candle time,
+    close, ML probability, technical score and volatility. Only candles after
+    the model's training window are returned, so the replay is out-of-sample.
+    The model's predict_proba runs once on the whole feature matrix. With
+    background=True (the bot) a missing model is trained by retrain.scheduler
+    and the ML input stays neutral; offline callers pass False to train inline.
+    """
+    df = get_features(symbol, timeframe, limit)
+    if df.empty:
+        empty = np.zeros(0)
+        return {
+            "time": empty, "close": empty, "ml_prob": empty, "tech_score": empty, "volatility": empty,
+            "valid": empty.astype(bool),
+        }
+
+    valid = df[INDICATOR_COLS].notna().all(axis=1).to_numpy()
+    model = load_or_train(symbol, timeframe, background=background)
+
+    start = 0
+    if model is not None:
+        end = training_end(model)
+        if end is not None:
+            start = int(np.searchsorted(df["time"].to_numpy(), end, side="right"))
+        elif valid.any():
+            # Legacy pickles don't record their window; they were fit on the first 80% of valid rows
+            rows = np.flatnonzero(valid)
+            start = int(rows[int(len(rows) * 0.8)])
+    df, valid = df.iloc[start:], valid[start:]
+
+    ml_prob = np.full(len(df), 50.0)  # Neutral, as predict_confidence without a model
+    if model is not None and valid.any():
+        ml_prob[valid] = model.predict_proba(df.loc[valid, FEATURE_COLS])[:, 1] * 100
+
+    return {
+        "time": df["time"].to_numpy(),
+        "close": df["close"].to_numpy(),
+        "ml_prob": ml_prob,
+        "tech_score": technical_scores(df),
+        "volatility": df["VOLATILITY"].to_numpy(),
+        "valid": valid,
+    }
+
+
+def hybrid_positions(inputs, ml_weight=ML_WEIGHT, strategy_weight=STRATEGY_WEIGHT,
+                     threshold_buy=THRESHOLD_BUY, threshold_sell=THRESHOLD_SELL):
+    """Long on BUY, short on SELL, flat on WAIT, using the live decision rules."""
+    confidence = hybrid_confidence(
+        inputs["ml_prob"], inputs["tech_score"], inputs["volatility"], ml_weight, strategy_weight
+    )
+    position = np.where(confidence >= threshold_buy, 1, np.where(confidence <= threshold_sell, -1, 0))
+    position[~inputs["valid"]] = 0
+    return position
+
+
+@timed("backtest_hybrid")
+def backtest_hybrid(symbol, timeframe="1h", limit=3000):
+    """
+    Replays the hybrid ML + technical decision from strategy.analyze_symbol
+    over the candles after the model's training window.
+    """
+    inputs = hybrid_inputs(symbol, timeframe, limit)
+    position = hybrid_positions(inputs)
+    return {"symbol": symbol, "candles": len(inputs["close"]), **run_backtest(inputs["close"], position, timeframe)}
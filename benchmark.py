@@ -0,0 +1,248 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# Benchmarks run offline against replayed candles in their own work directory,
+# so they never touch the live exchange or the real models/archive. Settings
+# are read by config at import, so they are set before importing the project.
+WORK_DIR = os.path.abspath(os.getenv("BENCH_DIR", "bench_work"))
+os.environ["EXCHANGE"] = "replay"
+os.environ["DATA_DIR"] = os.path.join(WORK_DIR, "data")
+os.environ.setdefault("REPLAY_DIR", os.path.join(WORK_DIR, "fixtures"))
+os.environ["REPLAY_LATENCY"] = "0"
+
+TIMEFRAMES = ("1h", "4h")
+
+
+# ================= SETUP =================
+
+def bench_symbols(count):
+    """The configured symbols first, then synthetic ones up to `count`."""
+    from config import SYMBOLS
+    return (SYMBOLS + [f"SYN{i:03d}/USDT" for i in range(count)])[:count]
+
+
+def prepare(symbols, history, recorded_dir):
+    """
+    Writes replay fixtures of `history` candles per symbol. Recorded candles
+    (in the REPLAY_DIR given to the benchmark) are used where available,
+    synthetic ones otherwise. Also resets candles, features and signal caches.
+    """
+    import candles
+    from exchange import AsyncReplayExchange, ReplayExchange, fixture_path, synthetic_candles, write_fixture
+    from features import clear_features
+    from strategy import clear_results
+
+    fixture_dir = os.path.join(WORK_DIR, "fixtures", str(history))
+    for i, symbol in enumerate(symbols):
+        for timeframe in TIMEFRAMES:
+            recorded = fixture_path(symbol, timeframe, recorded_dir)
+            if os.path.exists(recorded):
+                rows = np.fromfile(recorded, dtype="<f8").reshape(-1, 6)[-history:]
+            else:
+                rows = synthetic_candles(history, timeframe, seed=i)
+            write_fixture(symbol, timeframe, rows, fixture_dir)
+
+    shutil.rmtree(os.environ["DATA_DIR"], ignore_errors=True)
+    candles.exchange = ReplayExchange(fixture_dir=fixture_dir)
+    candles._async_exchange = AsyncReplayExchange(fixture_dir=fixture_dir)
+    candles.clear_cache()
+    clear_features()
+    clear_results()
+
+
+def install_models(symbols, history):
+    """Trains one model and copies its artifact to every symbol; inference cost doesn't depend on the weights."""
+    from ml_model import get_model_path, train_model
+    train_model(symbols[0], "1h", limit=history)
+    source = get_model_path(symbols[0], "1h")
+    for symbol in symbols[1:]:
+        shutil.copyfile(source, get_model_path(symbol, "1h"))
+
+
+# ================= MEASUREMENT =================
+
+def measure(name, calls, repeat, before=None, symbols=0, history=0):
+    """
+    Runs every call in `calls` `repeat` times and reports latency percentiles
+    and throughput. Peak memory comes from one extra pass under tracemalloc,
+    so tracing doesn't inflate the timings.
+    """
+    latencies = []
+    for _ in range(repeat):
+        for call in calls:
+            if before:
+                before()
+            start = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - start)
+
+    if before:
+        before()
+    tracemalloc.start()
+    for call in calls:
+        call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    result = {
+        "path": name,
+        "symbols": symbols,
+        "history": history,
+        "samples": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+        "throughput_per_s": round(float(1000 / latencies.mean()), 2) if latencies.mean() > 0 else None,
+        "peak_mem_mb": round(peak / 2 ** 20, 2),
+    }
+    print(
+        f"{name:<24} {symbols:>4} sym {history:>6} bars | p50 {result['p50_ms']:>9.2f} ms "
+        f"p95 {result['p95_ms']:>9.2f} ms | {result['throughput_per_s']}/s | peak {result['peak_mem_mb']} MB"
+    )
+    return result
+
+
+def run(symbol_counts, histories, repeat, train_repeat, recorded_dir):
+    import backtest
+    import ml_model
+    import strategy
+    from features import clear_features
+
+    results = []
+    for history in histories:
+        for count in symbol_counts:
+            symbols = bench_symbols(count)
+            prepare(symbols, history, recorded_dir)
+            install_models(symbols, history)
+            tag = {"symbols": count, "history": history}
+
+            # Warm the candle store and streaming indicator state, as in a running bot
+            strategy.scan_market(symbols)
+
+            results.append(measure(
+                "analyze_symbol", [lambda s=s: strategy.analyze_symbol(s) for s in symbols],
+                repeat, before=strategy.clear_results, **tag,
+            ))
+            results.append(measure(
+                "analyze_symbol_cached", [lambda s=s: strategy.analyze_symbol(s) for s in symbols], repeat, **tag,
+            ))
+            results.append(measure(
+                "predict_confidence", [lambda s=s: ml_model.predict_confidence(s, "1h") for s in symbols], repeat, **tag,
+            ))
+            results.append(measure(
+                "scan_market", [lambda: strategy.scan_market(symbols)], repeat, before=strategy.clear_results, **tag,
+            ))
+            results.append(measure(
+                "backtest", [lambda s=s: backtest.backtest(s, "4h", history) for s in symbols],
+                repeat, before=clear_features, **tag,
+            ))
+
+        # Training cost depends on history, not on how many symbols are tracked
+        symbols = bench_symbols(min(symbol_counts))
+        results.append(measure(
+            "train_model", [lambda s=s: ml_model.train_model(s, "1h", limit=history) for s in symbols],
+            train_repeat, before=clear_features, symbols=len(symbols), history=history,
+        ))
+
+    return results
+
+
+# ================= COMPARISON =================
+
+def compare(baseline, current, tolerance):
+    """Prints p50/p95 changes against a baseline run. Returns the regressions beyond `tolerance`."""
+    previous = {(r["path"], r["symbols"], r["history"]): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        key = (r["path"], r["symbols"], r["history"])
+        if key not in previous:
+            continue
+        old = previous[key]
+        change = r["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0
+        flag = ""
+        if change > tolerance:
+            flag = "  ⚠️ REGRESSION"
+            regressions.append(key)
+        print(
+            f"{r['path']:<24} {r['symbols']:>4} sym {r['history']:>6} bars | "
+            f"p50 {old['p50_ms']:.2f} -> {r['p50_ms']:.2f} ms ({change:+.0%}) | "
+            f"p95 {old['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms{flag}"
+        )
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _ints(text):
+    return [int(v) for v in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, throughput and memory benchmarks for the hot paths")
+    parser.add_argument("--symbols", type=_ints, default=[3, 50, 500], help="symbol counts")
+    parser.add_argument("--history", type=_ints, default=[1000, 3000], help="candle history lengths")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--train-repeat", type=int, default=1)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    recorded_dir = os.path.abspath(os.environ["REPLAY_DIR"])
+    out = os.path.abspath(args.out)
+    commit = _git_commit()
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+
+    # models/ and the candle archive are relative to the working directory
+    os.makedirs(WORK_DIR, exist_ok=True)
+    os.chdir(WORK_DIR)
+
+    # Model metadata goes to an in-memory Mongo stand-in when one is installed
+    try:
+        import mongomock
+        import database
+        database.connect(mongomock.MongoClient())
+    except ImportError:
+        print("mongomock is not installed (see requirements-dev.txt); train_model timings include Mongo writes")
+
+    start = time.time()
+    report = {
+        "meta": {
+            "commit": commit,
+            "created_at": start,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": run(args.symbols, args.history, args.repeat, args.train_repeat, recorded_dir),
+    }
+    report["meta"]["duration"] = round(time.time() - start, 2)
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {out}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        if regressions:
+            sys.exit(1)
@@ -1,5 +1,8 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from ml_model import load_or_train
-from backtest import backtest
+from backtest import backtest, backtest_hybrid
 from telegram import Update
 from telegram.ext import (
     ApplicationBuilder,
@@ -9,9 +12,21 @@ from telegram.ext import (
     filters,
 )
 
-from config import BOT_TOKEN, ADMIN_ID, SYMBOLS
-from strategy import analyze_symbol, scan_market
-from database import add_user, is_user_approved, get_approved_users, log_history
+from config import (
+    BOT_TOKEN, ADMIN_ID, SYMBOLS, WORKER_THREADS, REQUEST_TIMEOUT,
+    SNAPSHOT_DELAY, SNAPSHOT_BROADCAST, BROADCAST_RATE, STREAMING,
+)
+from strategy import analyze_symbol
+from snapshot import current_snapshot, get_snapshot, seconds_until_close
+from database import (
+    add_user_async, get_approved_users_async, init_db_async, log_history, history_writer, run_db,
+    get_latest_scan_snapshot_async, subscribe_async, unsubscribe_async,
+    get_user_subscriptions_async, get_subscribers_by_symbol_async,
+)
+from alerts import action_changes, alert_messages, commit as commit_alerts, seed as seed_alerts
+from retrain import scheduler
+from stream import SignalEngine
+import metrics
 
 
 # =============================
@@ -19,8 +34,96 @@ from database import add_user, is_user_approved, get_approved_users, log_history
 # =============================
 # ml_model = load_or_train("BTC/USDT") # Removed: Now handled inside strategy.py
 
-approved_users = get_approved_users()
+# Loaded from Mongo at startup
+approved_users = set()
 
+# With STREAMING, signals are kept up to date from the kline stream
+signal_engine = SignalEngine(SYMBOLS) if STREAMING else None
+
+
+# =============================
+# BLOCKING WORK
+# =============================
+# Analysis does blocking exchange calls and may train a model, so it runs on
+# a bounded thread pool instead of the event loop.
+executor = ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="analysis")
+
+async def run_blocking(func, *args):
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(executor, func, *args), REQUEST_TIMEOUT)
+
+TIMEOUT_MESSAGE = "⌛ Analysis is taking too long, please try again shortly"
+
+
+# =============================
+# SCAN SNAPSHOT
+# =============================
+def format_scan(snapshot):
+    msg = "📊 MARKET SCAN (1D)\n\n"
+
+    for r in snapshot["results"]:
+        msg += (
+            f"{r['symbol']} | {r['action']}\n"
+            f"📈 Bull: {r['bull_prob']}%\n"
+            f"📉 Bear: {r['bear_prob']}%\n"
+            #f" Price: {r['price']}\n\n"
+        )
+
+    msg += f"\n{snapshot['bias']}"
+    return msg
+
+async def send_batched(bot, messages):
+    """Sends (chat_id, text) messages in batches of BROADCAST_RATE per second."""
+    messages = list(messages)
+    for i in range(0, len(messages), BROADCAST_RATE):
+        batch = messages[i:i + BROADCAST_RATE]
+        results = await asyncio.gather(
+            *(bot.send_message(chat_id=chat_id, text=text) for chat_id, text in batch),
+            return_exceptions=True,
+        )
+        for (chat_id, _), result in zip(batch, results):
+            if isinstance(result, Exception):
+                print(f"Send to {chat_id} failed: {result}")
+        if i + BROADCAST_RATE < len(messages):
+            await asyncio.sleep(1)
+
+async def broadcast(bot, text, chat_ids):
+    await send_batched(bot, [(chat_id, text) for chat_id in chat_ids])
+
+async def send_alerts(bot, snapshot):
+    """
+    Pushes changed actions to their subscribers, one message per subscriber.
+    The new baseline is committed only after the fan-out was attempted, so a
+    failed subscriber lookup leaves the change to alert on the next snapshot.
+    """
+    changes = action_changes(snapshot)
+    if changes:
+        subscribers = await get_subscribers_by_symbol_async()
+        messages = alert_messages(changes, subscribers, approved_users)
+        await send_batched(bot, messages.items())
+        log_history("alerts", {
+            "changes": [f"{symbol}: {previous} -> {r['action']}" for symbol, previous, r in changes],
+            "recipients": len(messages),
+        })
+    commit_alerts(snapshot)
+
+async def snapshot_loop(application):
+    """Rebuilds the scan snapshot right after every candle close and alerts subscribers."""
+    while True:
+        try:
+            # Shares the build with any /scan that got there first
+            snapshot = await run_blocking(current_snapshot, SYMBOLS)
+            try:
+                await send_alerts(application.bot, snapshot)
+            except Exception as e:
+                print(f"Signal alerts failed: {e}")
+            if SNAPSHOT_BROADCAST:
+                await broadcast(application.bot, format_scan(snapshot), approved_users)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Scan snapshot failed: {e}")
+        await asyncio.sleep(seconds_until_close("1h", SNAPSHOT_DELAY))
 
 
 # =============================
@@ -32,7 +135,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🚀 MarketForge v2\n\n"
         "Type BTC / ETH / SOL\n"
         "Use /scan for full market scan\n"
-        "Use /stats for strategy stats"
+        "Use /stats for strategy stats\n"
+        "Use /stats hybrid for live strategy stats\n"
+        "Use /subscribe BTC for alerts when a signal changes"
     )
 
 
@@ -57,7 +162,7 @@ async def approve(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("User already approved")
         return
 
-    add_user(uid)
+    await add_user_async(uid)
     approved_users.add(uid)
     log_history("approval", {"admin_id": ADMIN_ID, "approved_user": uid})
     await update.message.reply_text(f"✅ Approved {uid}")
@@ -75,22 +180,18 @@ async def scan(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⏳ Access pending")
         return
 
-    results, bias = scan_market(SYMBOLS)
-    log_history("command", {"command": "/scan", "user_id": chat_id, "bias": bias})
+    # Served from the snapshot built at candle close. While it is being
+    # rebuilt the previous one is served; only computed here if it's missing
+    snapshot = get_snapshot(load=False)
+    if snapshot is None:
+        try:
+            snapshot = await run_blocking(partial(current_snapshot, SYMBOLS, wait=False))
+        except asyncio.TimeoutError:
+            await update.message.reply_text(TIMEOUT_MESSAGE)
+            return
+    log_history("command", {"command": "/scan", "user_id": chat_id, "bias": snapshot["bias"]})
 
-    msg = "📊 MARKET SCAN (1D)\n\n"
-
-    for r in results:
-        msg += (
-            f"{r['symbol']} | {r['action']}\n"
-            f"📈 Bull: {r['bull_prob']}%\n"
-            f"📉 Bear: {r['bear_prob']}%\n"
-            #f" Price: {r['price']}\n\n"
-        )
-
-    msg += f"\n{bias}"
-
-    await update.message.reply_text(msg)
+    await update.message.reply_text(format_scan(snapshot))
 
 
 
@@ -105,16 +206,141 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("⏳ Access pending")
         return
 
-    msg = "📊 STRATEGY STATS (1D)\n\n"
-    log_history("command", {"command": "/stats", "user_id": chat_id})
+    # /stats hybrid replays the live ML + technical decision instead of the simple score
+    hybrid = bool(context.args) and context.args[0].lower() == "hybrid"
 
-    for sym in SYMBOLS:
-        res = backtest(sym)
+    msg = "📊 HYBRID STRATEGY STATS (1H)\n\n" if hybrid else "📊 STRATEGY STATS (1D)\n\n"
+    log_history("command", {"command": "/stats", "user_id": chat_id, "hybrid": hybrid})
+
+    try:
+        # Symbols are backtested in parallel on the worker pool
+        all_res = await asyncio.gather(*(
+            run_blocking(backtest_hybrid if hybrid else backtest, sym) for sym in SYMBOLS
+        ))
+    except asyncio.TimeoutError:
+        await update.message.reply_text(TIMEOUT_MESSAGE)
+        return
+
+    for sym, res in zip(SYMBOLS, all_res):
         msg += (
             f"🔹 {sym}\n"
             f"Winrate: {res['winrate']}%\n"
-            f"Trades: {res['trades']} ({res['wins']}W / {res['losses']}L)\n\n"
+            f"Trades: {res['trades']} ({res['wins']}W / {res['losses']}L)\n"
+            f"PnL: {res['pnl']}% | Max DD: {res['max_drawdown']}%\n"
         )
+        if hybrid:
+            # Only candles after the model's training window are replayed
+            msg += f"Out-of-sample candles: {res['candles']}\n"
+        msg += "\n"
+
+    await update.message.reply_text(msg)
+
+
+
+
+# =============================
+# COMMAND: /subscribe, /unsubscribe
+# =============================
+def parse_symbol(text):
+    symbol = text.upper()
+    if "/" not in symbol:
+        symbol += "/USDT"
+    return symbol if symbol in SYMBOLS else None
+
+async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+
+    if chat_id not in approved_users:
+        await update.message.reply_text("⏳ Access pending")
+        return
+
+    if not context.args:
+        current = await get_user_subscriptions_async(chat_id)
+        await update.message.reply_text(
+            f"🔔 Subscribed: {', '.join(current) if current else 'none'}\n"
+            "Usage: /subscribe <symbol>"
+        )
+        return
+
+    symbol = parse_symbol(context.args[0])
+    if symbol is None:
+        await update.message.reply_text(f"Unknown symbol. Available: {', '.join(SYMBOLS)}")
+        return
+
+    added = await subscribe_async(chat_id, symbol)
+    log_history("command", {"command": "/subscribe", "user_id": chat_id, "symbol": symbol})
+    if added:
+        await update.message.reply_text(f"🔔 You'll be alerted when the {symbol} signal changes")
+    else:
+        await update.message.reply_text(f"Already subscribed to {symbol}")
+
+async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+
+    if not context.args:
+        await update.message.reply_text("Usage: /unsubscribe <symbol|all>")
+        return
+
+    if context.args[0].lower() == "all":
+        symbol = None
+    else:
+        symbol = parse_symbol(context.args[0])
+        if symbol is None:
+            await update.message.reply_text(f"Unknown symbol. Available: {', '.join(SYMBOLS)}")
+            return
+
+    removed = await unsubscribe_async(chat_id, symbol)
+    log_history("command", {"command": "/unsubscribe", "user_id": chat_id, "symbol": symbol})
+    await update.message.reply_text(f"🔕 Removed {removed} subscription(s)")
+
+
+
+
+# =============================
+# COMMAND: /models (admin)
+# =============================
+async def models(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.id != ADMIN_ID:
+        await update.message.reply_text("❌ Not authorized")
+        return
+
+    msg = "🧠 MODELS\n\n"
+    for (symbol, timeframe), job in scheduler.status().items():
+        msg += f"{symbol} {timeframe} | {job['state']} | age: {job['age_hours']}h\n"
+        if job.get("last_error"):
+            msg += f"⚠️ {job['last_error']}\n"
+
+    await update.message.reply_text(msg)
+
+
+
+
+# =============================
+# COMMAND: /metrics (admin)
+# =============================
+async def metrics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_chat.id != ADMIN_ID:
+        await update.message.reply_text("❌ Not authorized")
+        return
+
+    # /metrics prom sends the Prometheus text format as a file
+    if context.args and context.args[0].lower() == "prom":
+        await update.message.reply_document(document=metrics.prometheus().encode(), filename="metrics.prom")
+        return
+
+    snap = metrics.snapshot()
+    msg = "📈 METRICS\n\n⏱ Stages (p50 / p95 / max ms, calls)\n"
+    for name, t in snap["timers"].items():
+        msg += f"{name}: {t['p50_ms']} / {t['p95_ms']} / {t['max_ms']} ({t['count']})\n"
+
+    msg += "\n🗃 Caches\n"
+    for cache, (hits, misses, ratio) in metrics.cache_ratios(snap["counters"]).items():
+        msg += f"{cache}: {round(ratio * 100, 1)}% hits ({hits} / {misses})\n"
+
+    msg += "\n🔢 Counters\n"
+    for name, value in snap["counters"].items():
+        if not name.endswith(("_cache_hits", "_cache_misses")):
+            msg += f"{name}: {value}\n"
 
     await update.message.reply_text(msg)
 
@@ -134,7 +360,16 @@ async def handle(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if text in ["BTC", "ETH", "SOL"]:
         symbol = text + "/USDT"
-        action, confidence, price = analyze_symbol(symbol)
+        # Falls back to a direct analysis when the stream is behind the last close
+        signal = signal_engine.signal(symbol) if signal_engine else None
+        if signal is not None:
+            action, confidence, price = signal["action"], signal["confidence"], signal["price"]
+        else:
+            try:
+                action, confidence, price = await run_blocking(analyze_symbol, symbol)
+            except asyncio.TimeoutError:
+                await update.message.reply_text(TIMEOUT_MESSAGE)
+                return
         log_history("query", {"symbol": symbol, "user_id": chat_id, "action": action, "confidence": confidence})
 
         message = (
@@ -157,12 +392,58 @@ async def handle(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # =============================
 # RUN BOT
 # =============================
-app = ApplicationBuilder().token(BOT_TOKEN).build()
+async def startup(application):
+    # Indexes and the admin user are set up once, off the event loop
+    await init_db_async()
+    approved_users.update(await get_approved_users_async())
+    # Reuse the stored scan snapshot if the bot restarted within the same candle
+    await run_db(get_snapshot)
+    # Alert only on actions that changed since the last stored snapshot
+    last_snapshot = await get_latest_scan_snapshot_async("1h")
+    if last_snapshot:
+        seed_alerts(last_snapshot)
+
+    # Models for the live timeframe are retrained in the background before they expire
+    for sym in SYMBOLS:
+        scheduler.track(sym, "1h")
+    scheduler.start()
+
+    if signal_engine:
+        signal_engine.start()
+
+    # The market scan is precomputed once per candle for every /scan
+    application.bot_data["snapshot_task"] = asyncio.create_task(snapshot_loop(application))
+
+async def shutdown(application):
+    task = application.bot_data.get("snapshot_task")
+    if task is not None:
+        task.cancel()
+    if signal_engine:
+        # Joins the stream thread, so it runs off the event loop
+        await asyncio.to_thread(signal_engine.stop)
+    scheduler.stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+    # Buffered history events are written before exit
+    history_writer.stop()
+
+# Updates are handled concurrently so one slow request doesn't queue everyone else
+app = (
+    ApplicationBuilder()
+    .token(BOT_TOKEN)
+    .concurrent_updates(True)
+    .post_init(startup)
+    .post_shutdown(shutdown)
+    .build()
+)
 
 app.add_handler(CommandHandler("start", start))
 app.add_handler(CommandHandler("approve", approve))
 app.add_handler(CommandHandler("scan", scan))
 app.add_handler(CommandHandler("stats", stats))
+app.add_handler(CommandHandler("models", models))
+app.add_handler(CommandHandler("metrics", metrics_command))
+app.add_handler(CommandHandler("subscribe", subscribe))
+app.add_handler(CommandHandler("unsubscribe", unsubscribe))
 app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle))
 
 app.run_polling()
@@ -0,0 +1,421 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import ccxt
+import numpy as np
+import pandas as pd
+from config import DATA_DIR, CANDLE_ARCHIVE, CANDLES_OFFLINE, RATE_LIMIT_WEIGHT
+from exchange import create_async_exchange, create_exchange, klines_weight
+from metrics import cache_hit, cache_miss, inc, timer
+
+exchange = create_exchange()
+
+OHLCV_COLUMNS = ["time", "open", "high", "low", "close", "volume"]
+
+# Binance returns at most 1000 candles per klines request
+PAGE_LIMIT = 1000
+
+# Process-wide candle store: (symbol, timeframe) -> {"df", "limit", "expires_at"}
+_store = {}
+_store_lock = threading.Lock()
+_key_locks = {}
+
+
+def timeframe_ms(timeframe):
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def _key_lock(key):
+    with _store_lock:
+        if key not in _key_locks:
+            _key_locks[key] = threading.Lock()
+        return _key_locks[key]
+
+
+# ================= ARCHIVE =================
+# One file per (symbol, timeframe) under DATA_DIR/candles, holding rows of
+# six little-endian float64 values (time, open, high, low, close, volume).
+# Files are read through np.memmap, so only the requested tail is paged in,
+# and new candles are written in place / appended without rewriting history.
+
+ROW_DTYPE = np.dtype("<f8")
+
+
+def archive_path(symbol, timeframe):
+    safe_symbol = symbol.replace("/", "_")
+    return os.path.join(DATA_DIR, "candles", f"{safe_symbol}_{timeframe}.bin")
+
+
+def _open_archive(symbol, timeframe):
+    path = archive_path(symbol, timeframe)
+    row_bytes = len(OHLCV_COLUMNS) * ROW_DTYPE.itemsize
+    n_rows = os.path.getsize(path) // row_bytes if os.path.exists(path) else 0
+    if n_rows == 0:
+        return None
+    # Ignore a partially written trailing row, if any
+    return np.memmap(path, dtype=ROW_DTYPE, mode="r", shape=(n_rows, len(OHLCV_COLUMNS)))
+
+
+def _to_frame(rows):
+    df = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+    df["time"] = df["time"].astype("int64")
+    return df
+
+
+def read_archive(symbol, timeframe, limit=None):
+    """Returns the last `limit` archived candles (all if None) without touching the network."""
+    rows = _open_archive(symbol, timeframe)
+    if rows is None:
+        return pd.DataFrame(columns=OHLCV_COLUMNS)
+    if limit is not None:
+        rows = rows[-limit:]
+    return _to_frame(rows)
+
+
+def write_archive(symbol, timeframe, df):
+    """
+    Stores candles for symbol/timeframe. Candles at or after the first new
+    timestamp are overwritten in place and the rest appended; if the new
+    candles start before the archive does, the file is rewritten atomically.
+    """
+    if df.empty:
+        return
+
+    path = archive_path(symbol, timeframe)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    new_rows = np.ascontiguousarray(df[OHLCV_COLUMNS].to_numpy(dtype=ROW_DTYPE))
+    existing = _open_archive(symbol, timeframe)
+
+    if existing is not None and new_rows[0, 0] >= existing[0, 0]:
+        pos = int(np.searchsorted(existing[:, 0], new_rows[0, 0]))
+        if len(new_rows) >= len(existing) - pos:
+            # Overwrite rather than truncate: readers may still hold a mapping of this file
+            with open(path, "r+b") as f:
+                f.seek(pos * new_rows.shape[1] * ROW_DTYPE.itemsize)
+                f.write(new_rows.tobytes())
+            return
+
+    if existing is not None:
+        merged = _merge(_to_frame(existing), df, None)
+        new_rows = np.ascontiguousarray(merged[OHLCV_COLUMNS].to_numpy(dtype=ROW_DTYPE))
+
+    # Unique temp file per writer, so concurrent processes can't interleave their swaps
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix=os.path.basename(path) + ".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(new_rows.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# ================= RATE LIMIT =================
+
+class TokenBucket:
+    """Request weight budget shared by every exchange call in the process."""
+
+    def __init__(self, capacity, per_second):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _take(self, weight):
+        """Takes `weight` tokens if available, otherwise returns the seconds to wait."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+            self.updated = now
+            if self.tokens >= weight:
+                self.tokens -= weight
+                return 0
+            return (weight - self.tokens) / self.per_second
+
+    def acquire(self, weight=1):
+        while True:
+            wait = self._take(weight)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, weight=1):
+        while True:
+            wait = self._take(weight)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+# Binance allows 6000 request weight per minute per IP; RATE_LIMIT_WEIGHT leaves headroom
+rate_limiter = TokenBucket(RATE_LIMIT_WEIGHT, RATE_LIMIT_WEIGHT / 60)
+EXCHANGE_INFO_WEIGHT = 20
+
+
+# ================= FETCH =================
+
+def _fetch_since(symbol, timeframe, since):
+    """Pages forward from `since` (ms) until the exchange has no newer candles."""
+    tf_ms = timeframe_ms(timeframe)
+    rows = []
+    while True:
+        with timer("rate_limit_wait"):
+            rate_limiter.acquire(klines_weight(PAGE_LIMIT))
+        with timer("exchange_fetch"):
+            page = exchange.fetch_ohlcv(symbol, timeframe=timeframe, since=int(since), limit=PAGE_LIMIT)
+        inc("exchange_requests")
+        if not page:
+            break
+        rows.extend(page)
+        # A short page, or one ending in the still-open candle, is the end of history
+        if len(page) < PAGE_LIMIT or page[-1][0] + tf_ms > time.time() * 1000:
+            break
+        since = page[-1][0] + 1
+    return pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+
+
+async def _fetch_since_async(aexchange, symbol, timeframe, since):
+    """_fetch_since for an async ccxt exchange."""
+    tf_ms = timeframe_ms(timeframe)
+    rows = []
+    while True:
+        with timer("rate_limit_wait"):
+            await rate_limiter.acquire_async(klines_weight(PAGE_LIMIT))
+        with timer("exchange_fetch"):
+            page = await aexchange.fetch_ohlcv(symbol, timeframe=timeframe, since=int(since), limit=PAGE_LIMIT)
+        inc("exchange_requests")
+        if not page:
+            break
+        rows.extend(page)
+        if len(page) < PAGE_LIMIT or page[-1][0] + tf_ms > time.time() * 1000:
+            break
+        since = page[-1][0] + 1
+    return pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+
+
+def _merge(old, new, limit):
+    """Appends new candles, replacing the previously open candle with its final version."""
+    if old.empty:
+        df = new
+    else:
+        df = pd.concat([old, new], ignore_index=True)
+        df = df.drop_duplicates(subset="time", keep="last").sort_values("time")
+    if limit is not None:
+        df = df.tail(limit)
+    return df.reset_index(drop=True)
+
+
+def _plan(symbol, timeframe, limit, entry=None):
+    """
+    Decides what to fetch for symbol/timeframe.
+    Returns (candles already held, `since` in ms or None if nothing can be fetched, limit).
+    """
+    archived = pd.DataFrame(columns=OHLCV_COLUMNS)
+    if entry is not None and entry["limit"] >= limit and not entry["df"].empty:
+        old = entry["df"]
+        limit = entry["limit"]
+    elif CANDLE_ARCHIVE or CANDLES_OFFLINE:
+        archived = read_archive(symbol, timeframe, limit)
+        old = archived if len(archived) >= limit or CANDLES_OFFLINE else pd.DataFrame(columns=OHLCV_COLUMNS)
+    else:
+        old = pd.DataFrame(columns=OHLCV_COLUMNS)
+
+    if CANDLES_OFFLINE:
+        return old, None, limit
+
+    if old.empty:
+        since = time.time() * 1000 - limit * timeframe_ms(timeframe)
+        if not archived.empty:
+            # Continue from a short archive rather than leaving a gap in it
+            since = min(since, archived["time"].iloc[-1])
+    else:
+        # Only ask for candles from the last stored (previously open) candle onwards
+        since = old["time"].iloc[-1]
+
+    return old, since, limit
+
+
+def _complete(symbol, timeframe, old, new, limit):
+    if CANDLE_ARCHIVE:
+        write_archive(symbol, timeframe, new)
+    return _merge(old, new, limit)
+
+
+def _fetch(symbol, timeframe, limit, entry=None):
+    old, since, limit = _plan(symbol, timeframe, limit, entry)
+    if since is None:
+        return old
+    return _complete(symbol, timeframe, old, _fetch_since(symbol, timeframe, since), limit)
+
+
+# ================= STORE =================
+
+def _is_fresh(entry, limit):
+    return (
+        entry is not None
+        and time.time() * 1000 < entry["expires_at"]
+        and entry["limit"] >= limit
+    )
+
+
+def _store_entry(key, df, limit):
+    if CANDLES_OFFLINE:
+        expires_at = float("inf")
+    else:
+        # The last candle is still open; it closes one timeframe after it opened
+        expires_at = df["time"].iloc[-1] + timeframe_ms(key[1])
+    entry = {"df": df, "limit": max(limit, len(df)), "expires_at": expires_at}
+    _store[key] = entry
+    return entry
+
+
+def get_ohlcv(symbol, timeframe="1h", limit=3000):
+    """
+    Returns the last `limit` candles for symbol/timeframe as a DataFrame.
+    Candles are fetched once and shared until the current candle closes;
+    after that only the candles newer than the last stored one are requested.
+    With CANDLES_OFFLINE set, candles come from the on-disk archive only.
+    The returned frame is a copy, so callers may add indicator columns to it.
+    """
+    key = (symbol, timeframe)
+
+    with _key_lock(key):
+        entry = _store.get(key)
+        if _is_fresh(entry, limit):
+            cache_hit("candles")
+        else:
+            cache_miss("candles")
+            df = _fetch(symbol, timeframe, limit, entry)
+            if df.empty:
+                return df
+            entry = _store_entry(key, df, limit)
+
+    return entry["df"].tail(limit).reset_index(drop=True).copy()
+
+
+# ================= CONCURRENT PREFETCH =================
+# The async exchange lives on one background event loop so its HTTP session
+# and loaded markets are reused by every prefetch, from any thread.
+
+_async_loop = None
+_async_exchange = None
+
+
+def _run_async(coro):
+    global _async_loop
+    with _store_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            threading.Thread(target=_async_loop.run_forever, name="candles-async", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _async_loop).result()
+
+
+def reset_async():
+    """Forgets the prefetch loop and async exchange, e.g. in a forked process where the loop thread isn't running."""
+    global _async_loop, _async_exchange
+    _async_loop = None
+    _async_exchange = None
+
+
+async def _fetch_all(plans, timeframe):
+    global _async_exchange
+    if _async_exchange is None:
+        _async_exchange = create_async_exchange()
+    if not _async_exchange.markets:
+        await rate_limiter.acquire_async(EXCHANGE_INFO_WEIGHT)
+        await _async_exchange.load_markets()
+
+    return await asyncio.gather(
+        *(_fetch_since_async(_async_exchange, symbol, timeframe, since) for symbol, (_, since, _) in plans.items()),
+        return_exceptions=True,
+    )
+
+
+def prefetch(symbols, timeframe="1h", limit=3000):
+    """
+    Refreshes candles for many symbols concurrently through ccxt.async_support,
+    so a market scan waits for the slowest symbol rather than the sum of all.
+    Symbols that fail are left for get_ohlcv to fetch on demand.
+    """
+    plans = {}
+    for symbol in symbols:
+        entry = _store.get((symbol, timeframe))
+        if _is_fresh(entry, limit):
+            continue
+        plan = _plan(symbol, timeframe, limit, entry)
+        if plan[1] is not None:
+            plans[symbol] = plan
+
+    if not plans:
+        return
+
+    with timer("prefetch"):
+        results = _run_async(_fetch_all(plans, timeframe))
+
+    for (symbol, (old, _, plan_limit)), new in zip(plans.items(), results):
+        if isinstance(new, Exception):
+            print(f"Error prefetching {symbol}: {new}")
+            continue
+
+        key = (symbol, timeframe)
+        with _key_lock(key):
+            df = _complete(symbol, timeframe, old, new, plan_limit)
+            if not df.empty:
+                _store_entry(key, df, plan_limit)
+
+
+# ================= STREAMING =================
+
+def last_candle_time(symbol, timeframe):
+    """Open time of the newest stored candle (the still-open one), or None."""
+    entry = _store.get((symbol, timeframe))
+    if entry is None or entry["df"].empty:
+        return None
+    return int(entry["df"]["time"].iloc[-1])
+
+
+def push_candles(symbol, timeframe, rows):
+    """
+    Merges streamed OHLCV rows (as returned by ccxt.pro watch_ohlcv) into the
+    store, so queries are served without REST polling while the stream is
+    live. Returns True when a new candle opened, i.e. the previous one closed.
+    Symbols not yet in the store are ignored; fetch them once with get_ohlcv.
+    """
+    key = (symbol, timeframe)
+    new = pd.DataFrame(rows, columns=OHLCV_COLUMNS)
+
+    with _key_lock(key):
+        entry = _store.get(key)
+        if entry is None or entry["df"].empty or new.empty:
+            return False
+
+        last = entry["df"]["time"].iloc[-1]
+        new = new[new["time"] >= last]
+        if new.empty:
+            return False
+
+        if new["time"].iloc[0] > last + timeframe_ms(timeframe):
+            # Candles were missed while disconnected: backfill them over REST
+            df = _merge(_fetch(symbol, timeframe, entry["limit"], entry), new, entry["limit"])
+        else:
+            df = _merge(entry["df"], new, entry["limit"])
+        _store_entry(key, df, entry["limit"])
+
+        closed = new["time"].iloc[-1] > last
+        if closed and CANDLE_ARCHIVE:
+            write_archive(symbol, timeframe, df[df["time"] >= last])
+
+    inc("stream_updates")
+    return closed
+
+
+def clear_cache(symbol=None, timeframe=None):
+    with _store_lock:
+        for key in list(_store):
+            if symbol in (None, key[0]) and timeframe in (None, key[1]):
+                del _store[key]
@@ -16,4 +16,55 @@ DB_NAME = os.getenv("DB_NAME", "marketforge")
 ML_WEIGHT = float(os.getenv("ML_WEIGHT", "0.5"))
 STRATEGY_WEIGHT = float(os.getenv("STRATEGY_WEIGHT", "0.5"))
 THRESHOLD_BUY = int(os.getenv("THRESHOLD_BUY", "65"))
-THRESHOLD_SELL = int(os.getenv("THRESHOLD_SELL", "35"))
\ No newline at end of file
+THRESHOLD_SELL = int(os.getenv("THRESHOLD_SELL", "35"))
+
+# Candle Archive Settings
+DATA_DIR = os.getenv("DATA_DIR", "data")
+CANDLE_ARCHIVE = os.getenv("CANDLE_ARCHIVE", "1") == "1"
+CANDLES_OFFLINE = os.getenv("CANDLES_OFFLINE", "0") == "1"
+
+# Exchange Settings: a ccxt exchange id, or "replay" to serve recorded fixtures offline
+EXCHANGE = os.getenv("EXCHANGE", "binance")
+REPLAY_DIR = os.getenv("REPLAY_DIR", os.path.join(DATA_DIR, "fixtures"))
+REPLAY_LATENCY = float(os.getenv("REPLAY_LATENCY", "0"))  # seconds per request
+REPLAY_RATE_LIMIT = int(os.getenv("REPLAY_RATE_LIMIT", "0"))  # weight per minute, 0 for no limit
+
+# Exchange request weight budget per minute (Binance allows 6000)
+RATE_LIMIT_WEIGHT = int(os.getenv("RATE_LIMIT_WEIGHT", "4800"))
+
+# Model Settings
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "32"))
+MODEL_MAX_AGE_HOURS = float(os.getenv("MODEL_MAX_AGE_HOURS", "24"))
+RETRAIN_LEAD_HOURS = float(os.getenv("RETRAIN_LEAD_HOURS", "2"))
+RETRAIN_WORKERS = int(os.getenv("RETRAIN_WORKERS", "1"))
+TRAIN_N_JOBS = int(os.getenv("TRAIN_N_JOBS", "1"))
+MODEL_PRECISION = os.getenv("MODEL_PRECISION", "float64")  # or float32 for smaller artifacts
+
+# Bot Concurrency Settings
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", "8"))
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "60"))
+
+# MongoDB Settings
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))  # server selection timeout
+MONGO_THREADS = int(os.getenv("MONGO_THREADS", "4"))  # async access pool in the bot
+
+# History Logging Settings
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", "100"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "2"))
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", "10000"))  # oldest events dropped beyond this
+
+# Metrics Settings
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# Streaming Settings: candles pushed over WebSocket (ccxt.pro) instead of polled
+STREAMING = os.getenv("STREAMING", "0") == "1"
+STREAM_BATCH_DELAY = float(os.getenv("STREAM_BATCH_DELAY", "0.5"))  # seconds to gather candle closes
+REPLAY_FEED_INTERVAL = float(os.getenv("REPLAY_FEED_INTERVAL", "1"))  # seconds between replayed updates
+REPLAY_HOLD_BACK = int(os.getenv("REPLAY_HOLD_BACK", "0"))  # fixture candles kept back for the replay feed
+
+# Scan Snapshot Settings
+SNAPSHOT_DELAY = float(os.getenv("SNAPSHOT_DELAY", "5"))  # seconds after candle close
+SNAPSHOT_BROADCAST = os.getenv("SNAPSHOT_BROADCAST", "0") == "1"
+BROADCAST_RATE = int(os.getenv("BROADCAST_RATE", "25"))  # messages per second
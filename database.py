@@ -1,19 +1,70 @@
+import asyncio
+import atexit
+import threading
 import pymongo
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from config import MONGO_URI, DB_NAME, ADMIN_ID
+from functools import partial
+from config import (
+    MONGO_URI, DB_NAME, ADMIN_ID,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_TIMEOUT_MS, MONGO_THREADS,
+    HISTORY_BATCH_SIZE, HISTORY_FLUSH_SECONDS, HISTORY_BUFFER_SIZE,
+)
+from metrics import inc, timer
 
-client = pymongo.MongoClient(MONGO_URI)
-db = client[DB_NAME]
+# ================= CONNECTION =================
 
-# Collections
-users_col = db["users"]
-history_col = db["history"]
-models_col = db["models"]
+# Created on first use, so importing this module does no network I/O
+_client = None
+_db = None
+_client_lock = threading.Lock()
 
-# ================= USER MANAGEMENT =================
+def connect(client=None):
+    """
+    Returns the database, creating the pooled client on first use. Pass a
+    client (e.g. mongomock.MongoClient()) to use it instead.
+    """
+    global _client, _db
+    with _client_lock:
+        if client is not None:
+            _client, _db = client, client[DB_NAME]
+        elif _db is None:
+            _client = pymongo.MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+            )
+            _db = _client[DB_NAME]
+    return _db
+
+def collection(name):
+    return (_db if _db is not None else connect())[name]
+
+# Collection -> [(keys, options)]
+INDEXES = {
+    "users": [([("user_id", 1)], {"unique": True}), ([("approved", 1)], {})],
+    "history": [([("timestamp", -1)], {}), ([("event_type", 1), ("timestamp", -1)], {})],
+    "models": [([("symbol", 1), ("timeframe", 1)], {"unique": True})],
+    "evaluations": [([("symbol", 1), ("timeframe", 1), ("created_at", -1)], {})],
+    "scans": [([("timeframe", 1), ("candle_time", -1)], {})],
+    "subscriptions": [([("symbol", 1), ("user_id", 1)], {"unique": True}), ([("user_id", 1)], {})],
+}
+
+def ensure_indexes():
+    """Creates the indexes every lookup relies on; existing ones are left as they are."""
+    for name, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                collection(name).create_index(keys, **options)
+            except Exception as e:
+                print(f"Could not create index {keys} on {name}: {e}")
 
 def init_db():
-    """Initialize database with admin if not exists"""
+    """Creates indexes and the admin user if not exists. Run once at startup."""
+    ensure_indexes()
+    users_col = collection("users")
     if not users_col.find_one({"user_id": ADMIN_ID}):
         users_col.update_one(
             {"user_id": ADMIN_ID},
@@ -21,30 +72,155 @@ def init_db():
             upsert=True
         )
 
+# ================= USER MANAGEMENT =================
+
 def add_user(user_id):
-    users_col.update_one(
+    collection("users").update_one(
         {"user_id": user_id},
         {"$set": {"approved": True, "added_at": datetime.now()}},
         upsert=True
     )
 
 def is_user_approved(user_id):
-    user = users_col.find_one({"user_id": user_id, "approved": True})
+    user = collection("users").find_one({"user_id": user_id, "approved": True})
     return user is not None
 
 def get_approved_users():
-    users = users_col.find({"approved": True})
+    users = collection("users").find({"approved": True})
     return {user["user_id"] for user in users}
 
+# ================= SUBSCRIPTIONS =================
+
+def subscribe(user_id, symbol):
+    """Returns False if the user was already subscribed to symbol."""
+    result = collection("subscriptions").update_one(
+        {"user_id": user_id, "symbol": symbol},
+        {"$setOnInsert": {"created_at": datetime.now()}},
+        upsert=True
+    )
+    return result.upserted_id is not None
+
+def unsubscribe(user_id, symbol=None):
+    """Removes one subscription, or all of the user's if symbol is None. Returns how many were removed."""
+    query = {"user_id": user_id}
+    if symbol is not None:
+        query["symbol"] = symbol
+    return collection("subscriptions").delete_many(query).deleted_count
+
+def get_user_subscriptions(user_id):
+    return sorted(s["symbol"] for s in collection("subscriptions").find({"user_id": user_id}))
+
+def get_subscribers_by_symbol():
+    """symbol -> set of subscribed user ids."""
+    subscribers = {}
+    for s in collection("subscriptions").find({}, {"_id": 0, "symbol": 1, "user_id": 1}):
+        subscribers.setdefault(s["symbol"], set()).add(s["user_id"])
+    return subscribers
+
 # ================= HISTORY LOGGING =================
 
+class HistoryWriter:
+    """
+    Buffers history events in memory and writes them with insert_many from a
+    background thread, once HISTORY_BATCH_SIZE events are waiting or every
+    HISTORY_FLUSH_SECONDS. The buffer holds at most HISTORY_BUFFER_SIZE
+    events; the oldest are dropped if Mongo can't keep up.
+    """
+
+    def __init__(self, collection_name, batch_size=HISTORY_BATCH_SIZE, interval=HISTORY_FLUSH_SECONDS,
+                 max_size=HISTORY_BUFFER_SIZE):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.interval = interval
+        self.buffer = deque(maxlen=max_size)
+        self.dropped = 0
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.thread = None
+        self.stopped = False
+        self.failed = False
+
+    def add(self, entry):
+        with self.condition:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1
+                inc("history_dropped")
+            self.buffer.append(entry)
+            if self.thread is None and not self.stopped:
+                self.thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self.thread.start()
+            # After a failed flush the writer waits out the interval before retrying
+            if len(self.buffer) >= self.batch_size and not self.failed:
+                self.condition.notify()
+
+    def flush(self):
+        """
+        Writes everything buffered so far. Returns the number of events
+        written. On the first failed batch it stops and puts the batch back,
+        so the next interval retries it.
+        """
+        written = 0
+        with self.write_lock:
+            while True:
+                with self.condition:
+                    batch = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+                if not batch:
+                    return written
+                try:
+                    with timer("mongo_history_flush"):
+                        collection(self.collection_name).insert_many(batch, ordered=False)
+                    inc("history_written", len(batch))
+                    self.failed = False
+                    written += len(batch)
+                except Exception as e:
+                    # Keep the batch for the next interval instead of paying the
+                    # server timeout again for every remaining batch
+                    with self.condition:
+                        room = self.buffer.maxlen - len(self.buffer)
+                        lost = max(0, len(batch) - room)
+                        self.buffer.extendleft(reversed(batch[lost:]))
+                        self.dropped += lost
+                        self.failed = True
+                    if lost:
+                        inc("history_dropped", lost)
+                    print(f"History flush failed, retrying later ({lost} events dropped): {e}")
+                    return written
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.stopped and (self.failed or len(self.buffer) < self.batch_size):
+                    self.condition.wait(self.interval)
+                stopped = self.stopped
+            self.flush()
+            if stopped:
+                return
+
+    def stop(self):
+        """Flushes the remaining events and stops the writer."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+        # The writer thread made the final attempt; don't wait on a failing server twice
+        if not self.failed:
+            self.flush()
+
+history_writer = HistoryWriter("history")
+atexit.register(history_writer.stop)
+
 def log_history(event_type, data):
+    """Queues a history event; it reaches Mongo on the next batched flush."""
     entry = {
         "event_type": event_type,
         "data": data,
         "timestamp": datetime.now()
     }
-    history_col.insert_one(entry)
+    history_writer.add(entry)
+
+def flush_history():
+    return history_writer.flush()
 
 # ================= ML MODEL KNOWLEDGE =================
 
@@ -56,14 +232,75 @@ def save_model_metadata(symbol, accuracy, timeframe, metadata=None):
         "metadata": metadata or {},
         "updated_at": datetime.now()
     }
-    models_col.update_one(
+    collection("models").update_one(
         {"symbol": symbol, "timeframe": timeframe},
         {"$set": entry},
         upsert=True
     )
 
 def get_model_knowledge(symbol, timeframe):
-    return models_col.find_one({"symbol": symbol, "timeframe": timeframe})
+    return collection("models").find_one({"symbol": symbol, "timeframe": timeframe})
+
+def save_model_evaluation(symbol, timeframe, summary, folds):
+    """Stores a walk-forward run and keeps its summary on the model's knowledge entry."""
+    collection("evaluations").insert_one({
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "summary": summary,
+        "folds": folds,
+        "created_at": datetime.now()
+    })
+    collection("models").update_one(
+        {"symbol": symbol, "timeframe": timeframe},
+        {"$set": {"walk_forward": summary}},
+        upsert=True
+    )
+
+# ================= SCAN SNAPSHOTS =================
+
+def save_scan_snapshot(snapshot):
+    collection("scans").insert_one(snapshot)
+
+def get_latest_scan_snapshot(timeframe):
+    return collection("scans").find_one({"timeframe": timeframe}, {"_id": 0}, sort=[("candle_time", -1)])
+
+# ================= ASYNC ACCESS =================
+
+# pymongo is blocking, so the bot runs database calls on a small dedicated
+# pool; each thread borrows a connection from the client's pool
+_executor = ThreadPoolExecutor(max_workers=MONGO_THREADS, thread_name_prefix="mongo")
+
+async def run_db(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    with timer("mongo_query"):
+        return await loop.run_in_executor(_executor, partial(func, *args, **kwargs))
+
+async def init_db_async():
+    return await run_db(init_db)
+
+async def add_user_async(user_id):
+    return await run_db(add_user, user_id)
+
+async def is_user_approved_async(user_id):
+    return await run_db(is_user_approved, user_id)
+
+async def get_approved_users_async():
+    return await run_db(get_approved_users)
+
+async def get_model_knowledge_async(symbol, timeframe):
+    return await run_db(get_model_knowledge, symbol, timeframe)
+
+async def get_latest_scan_snapshot_async(timeframe):
+    return await run_db(get_latest_scan_snapshot, timeframe)
+
+async def subscribe_async(user_id, symbol):
+    return await run_db(subscribe, user_id, symbol)
+
+async def unsubscribe_async(user_id, symbol=None):
+    return await run_db(unsubscribe, user_id, symbol)
+
+async def get_user_subscriptions_async(user_id):
+    return await run_db(get_user_subscriptions, user_id)
 
-# Initialize on import
-init_db()
+async def get_subscribers_by_symbol_async():
+    return await run_db(get_subscribers_by_symbol)
@@ -1,25 +1,7 @@
-import ccxt
-import pandas as pd
-import ta
-
-exchange = ccxt.binance()
+from features import get_features
 
 def get_indicators(symbol, timeframe="4h", limit=3000):
-    df = pd.DataFrame(
-        exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit),
-        columns=["time","open","high","low","close","volume"]
-    )
-
-    # Indicators
-    df["EMA20"] = ta.trend.ema_indicator(df["close"], window=20)
-    df["EMA50"] = ta.trend.ema_indicator(df["close"], window=50)
-    df["RSI"] = ta.momentum.rsi(df["close"], window=14)
-
-    macd = ta.trend.MACD(df["close"])
-    df["MACD"] = macd.macd()
-    df["MACD_signal"] = macd.macd_signal()
-
-    return df
+    return get_features(symbol, timeframe, limit)
 
 def analyze_symbol(symbol):
     try:
@@ -34,7 +16,7 @@ def analyze_symbol(symbol):
         lt_last = lt_df.iloc[-1]
         
         print("HT Last:\n", ht_last[["EMA20", "EMA50"]])
-        print("LT Last:\n", lt_last[["RSI", "MACD", "MACD_signal", "close", "EMA20"]])
+        print("LT Last:\n", lt_last[["RSI", "MACD", "MACD_SIGNAL", "close", "EMA20"]])
 
         score = 0
 
@@ -62,7 +44,7 @@ def analyze_symbol(symbol):
         else:
             print("RSI: Neutral (0)")
 
-        if lt_last["MACD"] > lt_last["MACD_signal"]:
+        if lt_last["MACD"] > lt_last["MACD_SIGNAL"]:
             print("MACD: Bullish (+20)")
             score += 20
         else:
@@ -0,0 +1,184 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import SYMBOLS
+from features import FEATURE_COLS
+from ml_model import _dataset, _pipeline
+
+# Set in each worker process by _attach
+_X = None
+_y = None
+
+
+# ================= FOLDS =================
+
+def fold_windows(n, train_size=1000, test_size=200, step=None, expanding=False):
+    """
+    (train_start, test_start, test_end) index windows over n time-ordered rows.
+    Each fold trains on the rows just before its test window and never sees
+    later data; expanding=True keeps every earlier row in the training set.
+    """
+    step = step or test_size
+    return [
+        (0 if expanding else test_start - train_size, test_start, test_start + test_size)
+        for test_start in range(train_size, n - test_size + 1, step)
+    ]
+
+
+def calibration(y, prob, bins=10):
+    """Brier score, expected calibration error and a reliability table for bullish probabilities."""
+    edges = np.linspace(0, 1, bins + 1)
+    index = np.digitize(prob, edges[1:-1])
+
+    table = []
+    ece = 0.0
+    for b in range(bins):
+        mask = index == b
+        if not mask.any():
+            continue
+        mean_prob = float(prob[mask].mean())
+        frequency = float(y[mask].mean())
+        ece += mask.mean() * abs(mean_prob - frequency)
+        table.append({
+            "bin": b,
+            "count": int(mask.sum()),
+            "mean_prob": round(mean_prob, 4),
+            "frequency": round(frequency, 4),
+        })
+
+    brier = float(np.mean((prob - y) ** 2))
+    return round(brier, 4), round(float(ece), 4), table
+
+
+def _attach(matrix):
+    """Worker initializer: receives the feature matrix once instead of once per fold."""
+    global _X, _y
+    _X = matrix[:, :-1]
+    _y = matrix[:, -1].astype(int)
+
+
+def _evaluate_fold(window):
+    train_start, test_start, test_end = window
+
+    start = time.perf_counter()
+    # Folds already run in parallel, so each forest uses a single core
+    pipeline = _pipeline(n_jobs=1)
+    pipeline.fit(_X[train_start:test_start], _y[train_start:test_start])
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prob = pipeline.predict_proba(_X[test_start:test_end])[:, 1]
+    predict_seconds = time.perf_counter() - start
+
+    y = _y[test_start:test_end]
+    brier, ece, table = calibration(y, prob)
+    return {
+        "train_start": train_start,
+        "test_start": test_start,
+        "test_end": test_end,
+        "accuracy": round(float(((prob > 0.5) == y).mean()), 4),
+        "base_rate": round(float(y.mean()), 4),
+        "brier": brier,
+        "ece": ece,
+        "calibration": table,
+        "fit_seconds": round(fit_seconds, 3),
+        "predict_seconds": round(predict_seconds, 4),
+    }
+
+
+# ================= WALK-FORWARD =================
+
+def walk_forward(symbol, timeframe="1h", limit=3000, train_size=1000, test_size=200, step=None,
+                 expanding=False, workers=None, save=True):
+    """
+    Trains and scores the production pipeline on rolling windows, in parallel.
+    Features are built once and shared by every fold. Returns (summary, folds),
+    or None without enough data; save=True stores the run in Mongo.
+    """
+    df = _dataset(symbol, timeframe, limit)
+    if df is None:
+        return None
+    df = df.iloc[:-1]  # The last candle has no next close to label
+
+    windows = fold_windows(len(df), train_size, test_size, step, expanding)
+    if not windows:
+        print(f"Not enough data for walk-forward on {symbol}: {len(df)} rows")
+        return None
+
+    matrix = np.column_stack([df[FEATURE_COLS].to_numpy(dtype=float), df["target"].to_numpy(dtype=float)])
+    times = df["time"].to_numpy()
+
+    start = time.time()
+    with ProcessPoolExecutor(
+        max_workers=min(workers or os.cpu_count(), len(windows)),
+        initializer=_attach,
+        initargs=(matrix,),
+    ) as executor:
+        folds = list(executor.map(_evaluate_fold, windows))
+    elapsed = time.time() - start
+
+    for fold in folds:
+        fold["test_from"] = int(times[fold["test_start"]])
+        fold["test_to"] = int(times[fold["test_end"] - 1])
+
+    accuracy = np.array([fold["accuracy"] for fold in folds])
+    summary = {
+        "folds": len(folds),
+        "train_size": train_size,
+        "test_size": test_size,
+        "step": step or test_size,
+        "expanding": expanding,
+        "accuracy": round(float(accuracy.mean()), 4),
+        "accuracy_std": round(float(accuracy.std()), 4),
+        "accuracy_min": round(float(accuracy.min()), 4),
+        "base_rate": round(float(np.mean([fold["base_rate"] for fold in folds])), 4),
+        "brier": round(float(np.mean([fold["brier"] for fold in folds])), 4),
+        "ece": round(float(np.mean([fold["ece"] for fold in folds])), 4),
+        "fit_seconds": round(sum(fold["fit_seconds"] for fold in folds), 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "timestamp": time.time(),
+    }
+
+    if save:
+        try:
+            from database import save_model_evaluation
+            save_model_evaluation(symbol, timeframe, summary, folds)
+        except Exception as e:
+            print(f"Could not save evaluation for {symbol}: {e}")
+
+    return summary, folds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward evaluation of the ML model")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--timeframes", default="1h")
+    parser.add_argument("--limit", type=int, default=3000)
+    parser.add_argument("--train-size", type=int, default=1000)
+    parser.add_argument("--test-size", type=int, default=200)
+    parser.add_argument("--step", type=int, default=None)
+    parser.add_argument("--expanding", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    for symbol in args.symbols.split(","):
+        for timeframe in args.timeframes.split(","):
+            result = walk_forward(
+                symbol, timeframe, args.limit, args.train_size, args.test_size, args.step,
+                args.expanding, args.workers, save=not args.no_save,
+            )
+            if result is None:
+                continue
+            summary, _ = result
+            print(
+                f"{symbol} {timeframe}: {summary['folds']} folds, "
+                f"accuracy {round(summary['accuracy'] * 100, 2)}% ± {round(summary['accuracy_std'] * 100, 2)} "
+                f"(base rate {round(summary['base_rate'] * 100, 2)}%), "
+                f"brier {summary['brier']}, ECE {summary['ece']}, "
+                f"{summary['elapsed_seconds']}s ({summary['fit_seconds']}s of fitting)"
+            )
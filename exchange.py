@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+import numpy as np
+from config import (
+    SYMBOLS, EXCHANGE, REPLAY_DIR, REPLAY_LATENCY, REPLAY_RATE_LIMIT, REPLAY_FEED_INTERVAL, REPLAY_HOLD_BACK,
+)
+
+# Anything with ccxt's fetch_ohlcv(symbol, timeframe, since, limit) can serve
+# candles; the async client also needs load_markets(), markets and close().
+# Streaming feeds implement ccxt.pro's watch_ohlcv(symbol, timeframe) and close().
+# EXCHANGE picks the implementation: a ccxt exchange id, or "replay" to serve
+# recorded fixtures without any network access.
+
+FIXTURE_COLUMNS = 6  # time, open, high, low, close, volume, as in the candle archive
+ROW_DTYPE = np.dtype("<f8")
+
+
+def create_exchange():
+    if EXCHANGE == "replay":
+        return ReplayExchange()
+    return getattr(ccxt, EXCHANGE)()
+
+
+def create_async_exchange():
+    if EXCHANGE == "replay":
+        return AsyncReplayExchange()
+    # Request pacing is done by candles.rate_limiter, not ccxt's per-call throttle
+    return getattr(ccxt_async, EXCHANGE)({"enableRateLimit": False})
+
+
+def create_feed(rest_exchange=None):
+    """Kline stream for the configured exchange; the replay feed continues `rest_exchange`'s fixtures."""
+    if EXCHANGE == "replay":
+        return ReplayFeed(rest_exchange if isinstance(rest_exchange, ReplayExchange) else ReplayExchange())
+    import ccxt.pro as ccxt_pro
+    return getattr(ccxt_pro, EXCHANGE)()
+
+
+def klines_weight(limit):
+    """Binance klines request weight for a given limit (the conservative, limit-based table)."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+
+# ================= FIXTURES =================
+# One file per (symbol, timeframe) holding rows of six little-endian float64
+# values, the same layout as candles' archive, so an archive file can be
+# copied into REPLAY_DIR as a fixture.
+
+def fixture_path(symbol, timeframe, fixture_dir=REPLAY_DIR):
+    safe_symbol = symbol.replace("/", "_")
+    return os.path.join(fixture_dir, f"{safe_symbol}_{timeframe}.bin")
+
+
+def write_fixture(symbol, timeframe, rows, fixture_dir=REPLAY_DIR):
+    os.makedirs(fixture_dir, exist_ok=True)
+    rows = np.ascontiguousarray(np.asarray(rows, dtype=ROW_DTYPE).reshape(-1, FIXTURE_COLUMNS))
+    with open(fixture_path(symbol, timeframe, fixture_dir), "wb") as f:
+        f.write(rows.tobytes())
+
+
+def synthetic_candles(n, timeframe="1h", seed=0, start=0):
+    """Deterministic random-walk candles, for fixtures when nothing was recorded."""
+    tf_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    return np.column_stack([
+        start + np.arange(n) * tf_ms,
+        open_,
+        np.maximum(open_, close) * (1 + rng.uniform(0, 0.005, n)),
+        np.minimum(open_, close) * (1 - rng.uniform(0, 0.005, n)),
+        close,
+        rng.uniform(1, 10, n),
+    ])
+
+
+# ================= REPLAY =================
+
+class ReplayExchange:
+    """
+    Serves fetch_ohlcv from fixture files. With anchor=True the candles are
+    shifted in time so the last fixture candle is the currently open one,
+    which keeps candles' paging and candle-close expiry working unchanged.
+    `latency` (seconds) is added to every request, and `rate_limit` (request
+    weight per minute, 0 for none) makes requests over the budget fail with
+    ccxt.RateLimitExceeded, as Binance answers 429. The last `hold_back`
+    candles lie in the future and are only delivered by a ReplayFeed.
+    """
+
+    def __init__(self, fixture_dir=REPLAY_DIR, latency=REPLAY_LATENCY, rate_limit=REPLAY_RATE_LIMIT, anchor=True,
+                 hold_back=REPLAY_HOLD_BACK):
+        self.fixture_dir = fixture_dir
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.anchor = anchor
+        self.hold_back = hold_back
+        self.markets = None
+        self.requests = 0
+        self.used_weight = 0
+        self.window = None
+        self.lock = threading.Lock()
+        self._fixtures = {}
+
+    def parse_timeframe(self, timeframe):
+        return ccxt.Exchange.parse_timeframe(timeframe)
+
+    def _fixture(self, symbol, timeframe):
+        """(rows, time offset) for symbol/timeframe; files are memory-mapped once."""
+        key = (symbol, timeframe)
+        with self.lock:
+            if key not in self._fixtures:
+                path = fixture_path(symbol, timeframe, self.fixture_dir)
+                if not os.path.exists(path):
+                    raise ccxt.BadSymbol(f"No replay fixture for {symbol} {timeframe} in {self.fixture_dir}")
+                n_rows = os.path.getsize(path) // (FIXTURE_COLUMNS * ROW_DTYPE.itemsize)
+                rows = np.memmap(path, dtype=ROW_DTYPE, mode="r", shape=(n_rows, FIXTURE_COLUMNS))
+
+                offset = 0
+                if self.anchor and n_rows:
+                    tf_ms = self.parse_timeframe(timeframe) * 1000
+                    now = int(time.time() * 1000)
+                    offset = now // tf_ms * tf_ms - int(rows[max(0, n_rows - 1 - self.hold_back), 0])
+                self._fixtures[key] = (rows, offset)
+            return self._fixtures[key]
+
+    def _charge(self, limit):
+        """Counts request weight in fixed one-minute windows, like Binance's used-weight header."""
+        weight = klines_weight(limit)
+        with self.lock:
+            self.requests += 1
+            window = int(time.time() // 60)
+            if window != self.window:
+                self.window, self.used_weight = window, 0
+            if self.rate_limit and self.used_weight + weight > self.rate_limit:
+                raise ccxt.RateLimitExceeded(f"Replay weight limit of {self.rate_limit}/min exceeded")
+            self.used_weight += weight
+
+    def _page(self, symbol, timeframe, since, limit):
+        limit = min(limit or 500, 1000)
+        self._charge(limit)
+
+        rows, offset = self._fixture(symbol, timeframe)
+        times = rows[:, 0] + offset
+        end = int(np.searchsorted(times, time.time() * 1000, side="right"))
+        if since is None:
+            start = max(0, end - limit)
+        else:
+            start = int(np.searchsorted(times, since, side="left"))
+
+        page = np.array(rows[start:min(end, start + limit)])
+        page[:, 0] += offset
+        return [[int(row[0]), *row[1:].tolist()] for row in page]
+
+    def load_markets(self, reload=False):
+        self.markets = {}
+        return self.markets
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._page(symbol, timeframe, since, limit)
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """ReplayExchange with ccxt.async_support's coroutine interface."""
+
+    async def load_markets(self, reload=False):
+        return ReplayExchange.load_markets(self, reload)
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._page(symbol, timeframe, since, limit)
+
+    async def close(self):
+        pass
+
+
+class ReplayFeed:
+    """
+    Stand-in for a ccxt.pro kline stream over a ReplayExchange's fixtures.
+    Each watch_ohlcv call waits `interval` seconds, opens the next held-back
+    candle and returns it with the candle that just closed, as a WebSocket
+    kline stream does. Once the fixture runs out the last candle is resent.
+    """
+
+    def __init__(self, exchange, interval=REPLAY_FEED_INTERVAL):
+        self.exchange = exchange
+        self.interval = interval
+        self.cursors = {}
+
+    async def watch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        await asyncio.sleep(self.interval)
+        rows, offset = self.exchange._fixture(symbol, timeframe)
+
+        key = (symbol, timeframe)
+        cursor = self.cursors.get(key, max(0, len(rows) - 1 - self.exchange.hold_back))
+        cursor = min(cursor + 1, len(rows) - 1)
+        self.cursors[key] = cursor
+
+        page = np.array(rows[max(0, cursor - 1):cursor + 1])
+        page[:, 0] += offset
+        return [[int(row[0]), *row[1:].tolist()] for row in page]
+
+    async def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record or generate OHLCV fixtures for the replay exchange")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--timeframes", default="1h,1d")
+    parser.add_argument("--limit", type=int, default=3000)
+    parser.add_argument("--out", default=REPLAY_DIR)
+    parser.add_argument("--synthetic", action="store_true", help="generate random-walk candles instead of recording")
+    args = parser.parse_args()
+
+    for i, symbol in enumerate(args.symbols.split(",")):
+        for timeframe in args.timeframes.split(","):
+            if args.synthetic:
+                rows = synthetic_candles(args.limit, timeframe, seed=i)
+            else:
+                from candles import get_ohlcv
+                rows = get_ohlcv(symbol, timeframe, args.limit).to_numpy(dtype=float)
+            write_fixture(symbol, timeframe, rows, args.out)
+            print(f"Wrote {len(rows)} candles for {symbol} {timeframe}")
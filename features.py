@@ -0,0 +1,168 @@
+import threading
+import numpy as np
+import ta
+from candles import get_ohlcv
+from indicators import IndicatorState
+from metrics import cache_hit, cache_miss, timer
+
+# Model inputs, shared by training and inference
+FEATURE_COLS = [
+    "ema_diff", "price_dist_ema20", "price_dist_sma200",
+    "rsi", "macd_diff", "bb_width", "atr_ratio", "adx_ratio"
+]
+
+INDICATOR_COLS = [
+    "EMA20", "EMA50", "SMA200", "RSI", "MACD", "MACD_SIGNAL",
+    "BB_HIGH", "BB_LOW", "ATR", "ADX", "VOLATILITY"
+]
+
+# (symbol, timeframe, limit) -> (last candle time, last close, number of candles, frame)
+_memo = {}
+_memo_lock = threading.Lock()
+
+# (symbol, timeframe, limit) -> IndicatorState fed with closed candles. Each
+# key has its own lock, so seeding one symbol doesn't hold up the others.
+_states = {}
+_states_lock = threading.Lock()
+_state_locks = {}
+
+
+# ================= INDICATORS =================
+
+def add_indicators(df):
+    """Adds every indicator used by the strategy, the backtests and the ML model."""
+    # Trend
+    df["EMA20"] = ta.trend.ema_indicator(df["close"], window=20)
+    df["EMA50"] = ta.trend.ema_indicator(df["close"], window=50)
+    df["SMA200"] = ta.trend.sma_indicator(df["close"], window=200)
+
+    # Momentum
+    df["RSI"] = ta.momentum.rsi(df["close"], window=14)
+    macd = ta.trend.MACD(df["close"])
+    df["MACD"] = macd.macd()
+    df["MACD_SIGNAL"] = macd.macd_signal()
+
+    # Volatility
+    bb = ta.volatility.BollingerBands(df["close"], window=20, window_dev=2)
+    df["BB_HIGH"] = bb.bollinger_hband()
+    df["BB_LOW"] = bb.bollinger_lband()
+    df["ATR"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
+    df["VOLATILITY"] = df["close"].pct_change().rolling(20).std()
+
+    # Trend Strength
+    df["ADX"] = ta.trend.adx(df["high"], df["low"], df["close"], window=14)
+
+    return df
+
+
+def add_ml_features(df):
+    """Adds the normalized FEATURE_COLS the model is trained on (to a frame or a single row dict)."""
+    df["ema_diff"] = (df["EMA20"] - df["EMA50"]) / df["close"]
+    df["price_dist_ema20"] = (df["close"] - df["EMA20"]) / df["close"]
+    df["price_dist_sma200"] = (df["close"] - df["SMA200"]) / df["close"]
+    df["rsi"] = df["RSI"] / 100.0
+    df["macd_diff"] = (df["MACD"] - df["MACD_SIGNAL"]) / df["close"]
+    df["bb_width"] = (df["BB_HIGH"] - df["BB_LOW"]) / df["close"]
+    df["atr_ratio"] = df["ATR"] / df["close"]
+    df["adx_ratio"] = df["ADX"] / 100.0
+    return df
+
+
+# ================= FEATURE FRAME =================
+
+def get_features(symbol, timeframe="1h", limit=3000):
+    """
+    Returns candles with all indicators and ML features for symbol/timeframe.
+    The frame is computed once per candle set and reused until a new candle
+    arrives. Rows where indicators are still warming up contain NaN.
+    """
+    df = get_ohlcv(symbol, timeframe, limit)
+    if df.empty:
+        return df
+
+    key = (symbol, timeframe, limit)
+    version = (df["time"].iloc[-1], df["close"].iloc[-1], len(df))
+
+    with _memo_lock:
+        cached = _memo.get(key)
+    if cached is not None and cached[:3] == version:
+        cache_hit("features")
+        return cached[3].copy()
+
+    cache_miss("features")
+    with timer("indicators"):
+        frame = add_ml_features(add_indicators(df))
+    with _memo_lock:
+        _memo[key] = (*version, frame)
+
+    return frame.copy()
+
+
+def clear_features():
+    with _memo_lock:
+        _memo.clear()
+
+
+# ================= STREAMING =================
+
+def _state_lock(key):
+    with _states_lock:
+        if key not in _state_locks:
+            _state_locks[key] = threading.Lock()
+        return _state_locks[key]
+
+
+def get_latest(symbol, timeframe="1h", limit=3000):
+    """
+    Returns indicators and ML features for the latest candle as a dict.
+    Indicator state is seeded once by replaying the candle history and then
+    advanced by one O(1) step per newly closed candle; the still-open candle
+    is evaluated without changing the state.
+    """
+    df = get_ohlcv(symbol, timeframe, limit)
+    if df.empty:
+        return None
+
+    # Seeded from exactly `limit` candles, like get_features; a shorter history
+    # would leave warm-up NaNs (SMA200) in a state shared with other callers
+    key = (symbol, timeframe, limit)
+    closed = df.iloc[:-1]
+
+    with _state_lock(key), timer("indicators_stream"):
+        state = _states.get(key)
+        if state is None or state.last_time is None or state.last_time < df["time"].iloc[0]:
+            # First use, or a gap longer than the candle window: seed from history
+            state = IndicatorState()
+            _states[key] = state
+        else:
+            closed = closed[closed["time"] > state.last_time]
+
+        for candle in closed.to_dict("records"):
+            state.update(candle)
+
+        latest = state.update(df.iloc[-1].to_dict(), commit=False)
+
+    return add_ml_features(latest)
+
+
+def feature_vector(latest):
+    """FEATURE_COLS of a get_latest row as a NumPy vector, in model input order."""
+    return np.array([latest[col] for col in FEATURE_COLS], dtype=float)
+
+
+def validate_latest(symbol, timeframe="1h", limit=3000, tolerance=1e-6):
+    """Compares the streaming values with a full `ta` recompute; returns mismatching columns."""
+    latest = get_latest(symbol, timeframe, limit)
+    full = get_features(symbol, timeframe, limit)
+    if latest is None or full.empty:
+        return {}
+
+    expected = full.iloc[-1]
+    mismatches = {}
+    for col in INDICATOR_COLS + FEATURE_COLS:
+        a, b = latest[col], expected[col]
+        if a != a and b != b:
+            continue  # both NaN
+        if not abs(a - b) <= tolerance * max(1.0, abs(b)):
+            mismatches[col] = (a, b)
+    return mismatches
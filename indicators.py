@@ -0,0 +1,258 @@
+import math
+from collections import deque
+
+# Streaming versions of the `ta` indicators used in features.add_indicators.
+# Each indicator carries its smoothing state and takes one candle per call:
+#   update(..., commit=True)  -> advance the state with a closed candle
+#   update(..., commit=False) -> value for the still-open candle, state untouched
+# Warm-up behaviour matches `ta` (NaN, or 0 for ATR/ADX) so a state replayed over
+# a candle history reproduces the full-recompute columns.
+
+NAN = float("nan")
+
+
+class EMA:
+    """pandas ewm(adjust=False) with min_periods=window; alpha defaults to 2/(window+1)."""
+
+    def __init__(self, window, alpha=None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2 / (window + 1)
+        self.value = None
+        self.count = 0
+
+    def update(self, x, commit=True):
+        if self.value is None:
+            value = x
+        else:
+            value = self.alpha * x + (1 - self.alpha) * self.value
+
+        count = self.count + 1
+        if commit:
+            self.value, self.count = value, count
+
+        return value if count >= self.window else NAN
+
+
+class SMA:
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def update(self, x, commit=True):
+        total = self.total + x
+        if len(self.values) == self.window:
+            total -= self.values[0]
+
+        if commit:
+            self.values.append(x)
+            if len(self.values) > self.window:
+                self.values.popleft()
+            self.total = total
+            n = len(self.values)
+        else:
+            n = min(len(self.values) + 1, self.window)
+
+        return total / self.window if n >= self.window else NAN
+
+
+class RollingStd:
+    """Rolling standard deviation over the last `window` values (NaN inputs are skipped)."""
+
+    def __init__(self, window, ddof=0):
+        self.window = window
+        self.ddof = ddof
+        self.values = deque(maxlen=window)
+
+    def update(self, x, commit=True):
+        values = list(self.values)
+        if not math.isnan(x):
+            values = (values + [x])[-self.window:]
+            if commit:
+                self.values.append(x)
+
+        if len(values) < self.window:
+            return NAN, NAN
+
+        mean = sum(values) / self.window
+        var = sum((v - mean) ** 2 for v in values) / (self.window - self.ddof)
+        return mean, math.sqrt(var)
+
+
+class RSI:
+    """Wilder RSI, as ta.momentum.rsi."""
+
+    def __init__(self, window=14):
+        self.up = EMA(window, alpha=1 / window)
+        self.down = EMA(window, alpha=1 / window)
+        self.prev_close = None
+
+    def update(self, close, commit=True):
+        diff = 0.0 if self.prev_close is None else close - self.prev_close
+        up = self.up.update(max(diff, 0.0), commit)
+        down = self.down.update(max(-diff, 0.0), commit)
+        if commit:
+            self.prev_close = close
+
+        if math.isnan(down):
+            return NAN
+        if down == 0:
+            return 100.0
+        return 100 - (100 / (1 + up / down))
+
+
+class MACD:
+    def __init__(self, window_slow=26, window_fast=12, window_sign=9):
+        self.fast = EMA(window_fast)
+        self.slow = EMA(window_slow)
+        self.signal = EMA(window_sign)
+
+    def update(self, close, commit=True):
+        macd = self.fast.update(close, commit) - self.slow.update(close, commit)
+        if math.isnan(macd):
+            return NAN, NAN
+        # The signal line only starts once the MACD line is defined
+        return macd, self.signal.update(macd, commit)
+
+
+class BollingerBands:
+    def __init__(self, window=20, window_dev=2):
+        self.window_dev = window_dev
+        self.std = RollingStd(window)
+
+    def update(self, close, commit=True):
+        mavg, mstd = self.std.update(close, commit)
+        return mavg + self.window_dev * mstd, mavg - self.window_dev * mstd
+
+
+class ATR:
+    """Wilder ATR, as ta.volatility.average_true_range (0 during warm-up)."""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev_close = None
+        self.warmup = []
+        self.value = 0.0
+
+    def update(self, high, low, close, commit=True):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+
+        warmup = self.warmup
+        if len(warmup) < self.window - 1:
+            value = 0.0
+            warmup = warmup + [tr]
+        elif len(warmup) == self.window - 1:
+            value = (sum(warmup) + tr) / self.window
+            warmup = warmup + [tr]
+        else:
+            value = (self.value * (self.window - 1) + tr) / self.window
+
+        if commit:
+            self.prev_close, self.warmup, self.value = close, warmup, value
+        return value
+
+
+class ADX:
+    """
+    Wilder ADX, as ta.trend.adx (0 during warm-up). Like `ta`, directional
+    movement sums start at the second candle and ADX starts after `window`
+    directional index values.
+    """
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev = None
+        self.count = 0
+        self.sums = (0.0, 0.0, 0.0)
+        self.dx_warmup = []
+        self.value = 0.0
+
+    def update(self, high, low, close, commit=True):
+        w = self.window
+        count = self.count + 1
+        sums, dx_warmup, value = self.sums, self.dx_warmup, self.value
+
+        if self.prev is not None:
+            prev_high, prev_low, prev_close = self.prev
+            tr = max(high, prev_close) - min(low, prev_close)
+            up = high - prev_high
+            down = prev_low - low
+            pos = up if (up > down and up > 0) else 0.0
+            neg = down if (down > up and down > 0) else 0.0
+
+            if count <= w + 1:
+                sums = (sums[0] + tr, sums[1] + pos, sums[2] + neg)
+            else:
+                sums = tuple(s - s / w + x for s, x in zip(sums, (tr, pos, neg)))
+
+            if count >= w + 1:
+                s_tr, s_pos, s_neg = sums
+                dip = 100 * s_pos / s_tr if s_tr != 0 else 0.0
+                din = 100 * s_neg / s_tr if s_tr != 0 else 0.0
+                dx = 100 * abs((dip - din) / (dip + din)) if dip + din != 0 else 0.0
+
+                if len(dx_warmup) < w:
+                    dx_warmup = dx_warmup + [dx]
+                    if len(dx_warmup) == w:
+                        value = sum(dx_warmup) / w
+                else:
+                    value = (value * (w - 1) + dx) / w
+
+        if commit:
+            self.prev = (high, low, close)
+            self.count = count
+            self.sums, self.dx_warmup, self.value = sums, dx_warmup, value
+        return value
+
+
+class IndicatorState:
+    """All indicators from features.INDICATOR_COLS for one (symbol, timeframe)."""
+
+    def __init__(self):
+        self.ema20 = EMA(20)
+        self.ema50 = EMA(50)
+        self.sma200 = SMA(200)
+        self.rsi = RSI(14)
+        self.macd = MACD()
+        self.bb = BollingerBands(20, 2)
+        self.atr = ATR(14)
+        self.adx = ADX(14)
+        self.volatility = RollingStd(20, ddof=1)
+        self.last_close = None
+        self.last_time = None
+
+    def update(self, candle, commit=True):
+        """Feeds one candle (a mapping with OHLCV keys) and returns a row of indicator values."""
+        high, low, close = candle["high"], candle["low"], candle["close"]
+
+        ret = NAN if self.last_close is None else close / self.last_close - 1
+        macd, macd_signal = self.macd.update(close, commit)
+        bb_high, bb_low = self.bb.update(close, commit)
+
+        row = {
+            "time": candle["time"],
+            "open": candle["open"],
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": candle["volume"],
+            "EMA20": self.ema20.update(close, commit),
+            "EMA50": self.ema50.update(close, commit),
+            "SMA200": self.sma200.update(close, commit),
+            "RSI": self.rsi.update(close, commit),
+            "MACD": macd,
+            "MACD_SIGNAL": macd_signal,
+            "BB_HIGH": bb_high,
+            "BB_LOW": bb_low,
+            "ATR": self.atr.update(high, low, close, commit),
+            "ADX": self.adx.update(high, low, close, commit),
+            "VOLATILITY": self.volatility.update(ret, commit)[1],
+        }
+
+        if commit:
+            self.last_close = close
+            self.last_time = candle["time"]
+        return row
@@ -0,0 +1,188 @@
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from config import METRICS_ENABLED
+
+# In-process counters and latency histograms for the hot paths. Recording is
+# a dict lookup, a bisect and a few additions under a lock (about a
+# microsecond); with METRICS_ENABLED off every call is a no-op.
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf"))
+PREFIX = "marketforge"
+
+_histograms = {}
+_counters = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum", "max", "lock")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        with self.lock:
+            target = q * self.count
+            seen = 0
+            for bound, n in zip(BUCKETS, self.counts):
+                seen += n
+                if n and seen >= target:
+                    return min(bound, self.max)
+        return 0.0
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+# ================= RECORDING =================
+
+def histogram(name):
+    hist = _histograms.get(name)
+    if hist is None:
+        with _lock:
+            hist = _histograms.setdefault(name, Histogram())
+    return hist
+
+
+def timer(name):
+    """Context manager recording the duration of its block under `name`."""
+    if not METRICS_ENABLED:
+        return _NULL_TIMER
+    return _Timer(histogram(name))
+
+
+def timed(name):
+    """Decorator form of timer()."""
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(histogram(name)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inc(name, amount=1):
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def cache_hit(cache):
+    inc(f"{cache}_cache_hits")
+
+
+def cache_miss(cache):
+    inc(f"{cache}_cache_misses")
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# ================= REPORTING =================
+
+def snapshot():
+    """Plain dict of every timer (count, p50/p95/max/mean in ms) and counter."""
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+
+    timers = {}
+    for name, hist in sorted(histograms.items()):
+        timers[name] = {
+            "count": hist.count,
+            "p50_ms": round(hist.quantile(0.5) * 1000, 2),
+            "p95_ms": round(hist.quantile(0.95) * 1000, 2),
+            "max_ms": round(hist.max * 1000, 2),
+            "mean_ms": round(hist.sum / hist.count * 1000, 2) if hist.count else 0.0,
+        }
+    return {"timers": timers, "counters": dict(sorted(counters.items()))}
+
+
+def cache_ratios(counters):
+    """cache name -> (hits, misses, hit ratio) from the *_cache_hits / *_cache_misses counters."""
+    ratios = {}
+    for name, hits in counters.items():
+        if name.endswith("_cache_hits"):
+            cache = name[: -len("_cache_hits")]
+            misses = counters.get(f"{cache}_cache_misses", 0)
+            ratios[cache] = (hits, misses, hits / (hits + misses))
+    for name, misses in counters.items():
+        if name.endswith("_cache_misses"):
+            cache = name[: -len("_cache_misses")]
+            ratios.setdefault(cache, (0, misses, 0.0))
+    return ratios
+
+
+def prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = dict(_histograms)
+        counters = dict(_counters)
+
+    lines = []
+    for name, hist in sorted(histograms.items()):
+        metric = f"{PREFIX}_{name}_seconds"
+        with hist.lock:
+            counts, count, total = list(hist.counts), hist.count, hist.sum
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS, counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{metric}_sum {total}")
+        lines.append(f"{metric}_count {count}")
+
+    for name, value in sorted(counters.items()):
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -1,125 +1,201 @@
 import os
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 import joblib
+import numpy as np
 import pandas as pd
-import ccxt
-import ta
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
-
-exchange = ccxt.binance()
+from artifact import FORMAT_VERSION, load_artifact, save_artifact
+from config import MODEL_CACHE_SIZE, MODEL_MAX_AGE_HOURS, TRAIN_N_JOBS, MODEL_PRECISION
+from features import FEATURE_COLS, INDICATOR_COLS, feature_vector, get_features, get_latest
+from metrics import cache_hit, cache_miss, timer
 
 # Create models directory if not exists
 if not os.path.exists("models"):
     os.makedirs("models")
 
 def get_model_path(symbol, timeframe):
+    """Path of the compact model artifact, or of a legacy joblib pickle if only that exists."""
     safe_symbol = symbol.replace("/", "_")
-    return f"models/{safe_symbol}_{timeframe}.pkl"
+    path = f"models/{safe_symbol}_{timeframe}.mfm"
+    legacy_path = f"models/{safe_symbol}_{timeframe}.pkl"
+    if not os.path.exists(path) and os.path.exists(legacy_path):
+        return legacy_path
+    return path
+
+# ================= MODEL REGISTRY =================
+
+# (symbol, timeframe) -> (file version, pipeline), least recently used first
+_registry = OrderedDict()
+_registry_lock = threading.Lock()
+
+def _file_version(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+def model_version(symbol, timeframe):
+    """File version of the model on disk, or None when there is no model yet."""
+    try:
+        return _file_version(get_model_path(symbol, timeframe))
+    except OSError:
+        return None
+
+def _remember(key, version, model):
+    with _registry_lock:
+        _registry[key] = (version, model)
+        _registry.move_to_end(key)
+        while len(_registry) > MODEL_CACHE_SIZE:
+            _registry.popitem(last=False)
+
+def get_model(symbol="BTC/USDT", timeframe="1h"):
+    """
+    Returns the model for symbol/timeframe from memory, loading it from disk
+    only when the file changed since it was last loaded. At most
+    MODEL_CACHE_SIZE models are kept; the least recently used is evicted.
+    Raises ValueError for a model trained on other features than FEATURE_COLS.
+    """
+    model_path = get_model_path(symbol, timeframe)
+    key = (symbol, timeframe)
+    version = _file_version(model_path)
+
+    with _registry_lock:
+        cached = _registry.get(key)
+        if cached is not None and cached[0] == version:
+            _registry.move_to_end(key)
+            cache_hit("model")
+            return cached[1]
+
+    cache_miss("model")
+    with timer("model_load"):
+        if model_path.endswith(".pkl"):
+            model = joblib.load(model_path)
+        else:
+            model = load_artifact(model_path)
+    _check_features(model, model_path)
+    _remember(key, version, model)
+    return model
+
+def _check_features(model, model_path):
+    """
+    Rejects a model fit on other features than FEATURE_COLS. predict_many
+    passes plain arrays in FEATURE_COLS order, so a different schema would
+    silently give wrong probabilities.
+    """
+    if hasattr(model, "header"):
+        cols = model.header.get("feature_cols")
+    elif hasattr(model, "feature_names_in_"):
+        cols = model.feature_names_in_
+    else:
+        cols = None
+    if cols is None:
+        if getattr(model, "n_features_in_", len(FEATURE_COLS)) != len(FEATURE_COLS):
+            raise ValueError(f"{model_path} expects {model.n_features_in_} features, not {len(FEATURE_COLS)}")
+    elif list(cols) != FEATURE_COLS:
+        raise ValueError(f"{model_path} was trained on features {list(cols)}, not FEATURE_COLS")
 
 # ================= TRAIN MODEL =================
 
-def train_model(symbol="BTC/USDT", timeframe="1d", limit=3000):
-    print(f"Training model for {symbol} ({timeframe})...")
+def _dataset(symbol, timeframe, limit):
+    """Feature rows labeled with the next-candle direction, or None without enough data."""
+    # Indicators and features come from the shared feature pipeline
+    df = get_features(symbol, timeframe, limit)
+    if len(df) < 50:
+        print(f"Not enough data for {symbol}")
+        return None
+
+    df.dropna(subset=INDICATOR_COLS, inplace=True)
+
+    # --- Labeling ---
+    # Predict if price will be higher in next candle
+    # Can be tuned to predict % change, but classification is simpler for confidence
+    df["target"] = (df["close"].shift(-1) > df["close"]).astype(int)
     
-    try:
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-        if not ohlcv or len(ohlcv) < 50:
-            print(f"Not enough data for {symbol}")
-            return None
-            
-        df = pd.DataFrame(
-            ohlcv,
-            columns=["time","open","high","low","close","volume"]
-        )
+    df.dropna(inplace=True)
+    return df
 
-        # --- Indicators ---
-        # Trend
-        df["EMA20"] = ta.trend.ema_indicator(df["close"], window=20)
-        df["EMA50"] = ta.trend.ema_indicator(df["close"], window=50)
-        df["SMA200"] = ta.trend.sma_indicator(df["close"], window=200)
-        
-        # Momentum
-        df["RSI"] = ta.momentum.rsi(df["close"], window=14)
-        macd = ta.trend.MACD(df["close"])
-        df["MACD"] = macd.macd()
-        df["MACD_SIGNAL"] = macd.macd_signal()
-        
-        # Volatility
-        bb = ta.volatility.BollingerBands(df["close"], window=20, window_dev=2)
-        df["BB_HIGH"] = bb.bollinger_hband()
-        df["BB_LOW"] = bb.bollinger_lband()
-        df["ATR"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
-        
-        # Trend Strength
-        df["ADX"] = ta.trend.adx(df["high"], df["low"], df["close"], window=14)
-
-        df.dropna(inplace=True)
-
-        # --- Features ---
-        df["ema_diff"] = (df["EMA20"] - df["EMA50"]) / df["close"]
-        df["price_dist_ema20"] = (df["close"] - df["EMA20"]) / df["close"]
-        df["price_dist_sma200"] = (df["close"] - df["SMA200"]) / df["close"]
-        df["rsi"] = df["RSI"] / 100.0
-        df["macd_diff"] = (df["MACD"] - df["MACD_SIGNAL"]) / df["close"]
-        df["bb_width"] = (df["BB_HIGH"] - df["BB_LOW"]) / df["close"]
-        df["atr_ratio"] = df["ATR"] / df["close"]
-        df["adx_ratio"] = df["ADX"] / 100.0
-        
-        # --- Labeling ---
-        # Predict if price will be higher in next candle
-        # Can be tuned to predict % change, but classification is simpler for confidence
-        df["target"] = (df["close"].shift(-1) > df["close"]).astype(int)
-        
-        df.dropna(inplace=True)
-
-        feature_cols = [
-            "ema_diff", "price_dist_ema20", "price_dist_sma200", 
-            "rsi", "macd_diff", "bb_width", "atr_ratio", "adx_ratio"
-        ]
-        
-        X = df[feature_cols]
-        y = df["target"]
-
-        X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, shuffle=False
-        )
+def _pipeline(n_jobs=None):
+    # RandomForest is generally more robust for this than LogisticRegression
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(
+            n_estimators=100, max_depth=10, random_state=42,
+            n_jobs=n_jobs if n_jobs is not None else TRAIN_N_JOBS
+        ))
+    ])
+
+def _train(symbol, timeframe, limit, n_jobs=None):
+    """
+    Fits, saves and registers a model. Returns (pipeline, accuracy, n_samples,
+    metadata error or None), or None without enough data.
+    """
+    df = _dataset(symbol, timeframe, limit)
+    if df is None:
+        return None
+
+    X = df[FEATURE_COLS]
+    y = df["target"]
 
-        # RandomForest is generally more robust for this than LogisticRegression
-        pipeline = Pipeline([
-            ("scaler", StandardScaler()),
-            ("model", RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42))
-        ])
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, shuffle=False
+    )
 
+    pipeline = _pipeline(n_jobs)
+    with timer("model_fit"):
         pipeline.fit(X_train, y_train)
 
-        # Accuracy check
-        preds = pipeline.predict(X_test)
-        acc = accuracy_score(y_test, preds)
-        print(f"Model Accuracy for {symbol}: {round(acc*100, 2)}%")
-
-        # Save model
-        model_path = get_model_path(symbol, timeframe)
-        joblib.dump(pipeline, model_path)
-        
-        # Save metadata to MongoDB
-        from database import save_model_metadata
+    # Accuracy check
+    preds = pipeline.predict(X_test)
+    acc = accuracy_score(y_test, preds)
+    print(f"Model Accuracy for {symbol}: {round(acc*100, 2)}%")
+
+    # Save model as a compact artifact; written to a temp file and swapped in
+    # atomically so concurrent readers see either the old or the new model
+    safe_symbol = symbol.replace("/", "_")
+    model_path = f"models/{safe_symbol}_{timeframe}.mfm"
+    training_window = {
+        "start": int(df["time"].iloc[0]),
+        "end": int(df["time"].iloc[len(X_train) - 1]),
+        "n_samples": len(X_train),
+    }
+    save_artifact(pipeline, model_path, FEATURE_COLS, training_window, MODEL_PRECISION)
+    _remember((symbol, timeframe), _file_version(model_path), load_artifact(model_path))
+    
+    # Save metadata to MongoDB; the model is already in place, so a failure
+    # here is reported without failing the training
+    from database import save_model_metadata
+    metadata_error = None
+    try:
         save_model_metadata(
             symbol=symbol, 
             accuracy=acc, 
             timeframe=timeframe,
             metadata={
-                "feature_cols": feature_cols,
+                "feature_cols": FEATURE_COLS,
                 "n_samples": len(df),
+                "format_version": FORMAT_VERSION,
+                "precision": MODEL_PRECISION,
+                "training_window": training_window,
                 "timestamp": time.time()
             }
         )
-        
-        return pipeline
+    except Exception as e:
+        print(f"Error saving model metadata for {symbol}: {e}")
+        metadata_error = str(e)
+    
+    return pipeline, acc, len(df), metadata_error
 
+def train_model(symbol="BTC/USDT", timeframe="1d", limit=3000, n_jobs=None):
+    print(f"Training model for {symbol} ({timeframe})...")
+    
+    try:
+        result = _train(symbol, timeframe, limit, n_jobs)
+        return result[0] if result else None
 
     except Exception as e:
         import traceback
@@ -128,84 +204,150 @@ def train_model(symbol="BTC/USDT", timeframe="1d", limit=3000):
         return None
 
 
+# ================= BATCH TRAINING =================
+
+def _train_job(symbol, timeframe, limit, n_jobs):
+    start = time.time()
+    try:
+        result = _train(symbol, timeframe, limit, n_jobs)
+        error = None if result else "not enough data"
+    except Exception as e:
+        result, error = None, str(e)
+
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "accuracy": round(result[1], 4) if result else None,
+        "n_samples": result[2] if result else 0,
+        "seconds": round(time.time() - start, 2),
+        "error": error,
+        "metadata_error": result[3] if result else None,
+    }
+
+def _init_worker():
+    # Forked workers inherit the parent's prefetch loop state, but not the
+    # thread running that loop
+    from candles import reset_async
+    reset_async()
+
+def train_all(symbols, timeframes=("1h", "1d"), limit=3000, workers=None, n_jobs=None):
+    """
+    Trains every symbol x timeframe model on a process pool and returns one
+    report (accuracy, samples, wall time, error, metadata error) per model.
+    Candles are downloaded once per (symbol, timeframe) here, concurrently,
+    and reach the workers through the forked candle store and the on-disk
+    archive. Cores are split between worker processes and RandomForest tree
+    building (n_jobs).
+    """
+    from candles import prefetch
+
+    jobs = [(symbol, timeframe) for timeframe in timeframes for symbol in symbols]
+    cpus = os.cpu_count() or 1
+    workers = workers or min(len(jobs), cpus)
+    n_jobs = n_jobs or max(1, cpus // workers)
+
+    for timeframe in timeframes:
+        prefetch(symbols, timeframe, limit)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_train_job, symbol, timeframe, limit, n_jobs) for symbol, timeframe in jobs]
+        return [future.result() for future in futures]
+
+
 # ================= LOAD MODEL =================
 
-def load_or_train(symbol="BTC/USDT", timeframe="1h"):
+def load_or_train(symbol="BTC/USDT", timeframe="1h", background=False):
+    """
+    Returns the model for symbol/timeframe, training it if missing or outdated.
+    With background=True training never happens inline: an outdated model is
+    still returned and a missing or unloadable one (e.g. trained on other
+    features) returns None, while retrain.scheduler trains a replacement.
+    """
     model_path = get_model_path(symbol, timeframe)
     
-    # Check if model exists and is fresh (less than 24 hours old)
+    # Check if model exists and is fresh (less than MODEL_MAX_AGE_HOURS old)
     if os.path.exists(model_path):
         age = time.time() - os.path.getmtime(model_path)
-        if age < 24 * 3600:
+        if age < MODEL_MAX_AGE_HOURS * 3600 or background:
+            if age >= MODEL_MAX_AGE_HOURS * 3600:
+                from retrain import scheduler
+                scheduler.request(symbol, timeframe)
             try:
-                return joblib.load(model_path)
+                return get_model(symbol, timeframe)
             except Exception as e:
                 print(f"Error loading model for {symbol}: {e}")
                 pass
     
+    if background:
+        from retrain import scheduler
+        print(f"Model for {symbol} is missing. Training in the background...")
+        scheduler.request(symbol, timeframe)
+        return None
+
     # If model doesn't exist or is old, train a new one
     print(f"Model for {symbol} is missing or outdated. Retraining...")
     return train_model(symbol, timeframe)
 
 
+def training_end(model):
+    """Open time (ms) of the last candle `model` was fit on, or None when it isn't recorded."""
+    header = getattr(model, "header", None) or {}
+    return header.get("training_window", {}).get("end")
+
+
 # ================= PREDICT =================
 
-def predict_confidence(symbol="BTC/USDT", timeframe="1h"):
-    # Ensure we have a model
-    model = load_or_train(symbol, timeframe)
-    if model is None:
-        print(f"Warning: No model found/trained for {symbol}. Returning neutral confidence.")
-        return 50.0 # Neutral
+def _predict_rows(model, X):
+    """Bullish probability (0 to 100) for each row of a feature matrix."""
+    if hasattr(model, "feature_names_in_"):
+        # Legacy joblib pipelines were fit on a DataFrame and expect named columns
+        X = pd.DataFrame(X, columns=FEATURE_COLS)
+    return model.predict_proba(X)[:, 1] * 100
+
+def predict_many(requests):
+    """
+    Bullish probability (0 to 100) for many (symbol, timeframe, feature row)
+    requests, in request order. Rows for the same model are stacked into one
+    NumPy array and scored with a single predict_proba call. Requests without
+    a model, or with NaN features, get a neutral 50.
+    """
+    requests = list(requests)
+    probs = np.full(len(requests), 50.0)
 
+    groups = {}
+    for i, (symbol, timeframe, _) in enumerate(requests):
+        groups.setdefault((symbol, timeframe), []).append(i)
+
+    for (symbol, timeframe), idx in groups.items():
+        X = np.array([requests[i][2] for i in idx], dtype=float)
+        valid = ~np.isnan(X).any(axis=1)
+        if not valid.any():
+            continue
+
+        # Ensure we have a model; never train inside the request path
+        model = load_or_train(symbol, timeframe, background=True)
+        if model is None:
+            print(f"Warning: No model found/trained for {symbol}. Returning neutral confidence.")
+            continue
+
+        try:
+            with timer("predict_proba"):
+                probs[np.asarray(idx)[valid]] = _predict_rows(model, X[valid])
+        except Exception as e:
+            print(f"Error predicting for {symbol}: {e}")
+
+    return probs
+
+def predict_confidence(symbol="BTC/USDT", timeframe="1h"):
     try:
-        # Fetch fresh data for prediction
-        ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=3000)
-        df = pd.DataFrame(
-            ohlcv,
-            columns=["time","open","high","low","close","volume"]
-        )
+        # Features for the last candle from the streaming indicator state
+        last = get_latest(symbol, timeframe, 3000)
+        if last is None:
+            return 50.0  # Neutral
 
-        # Recreate indicators exactly as in training
-        df["EMA20"] = ta.trend.ema_indicator(df["close"], window=20)
-        df["EMA50"] = ta.trend.ema_indicator(df["close"], window=50)
-        df["SMA200"] = ta.trend.sma_indicator(df["close"], window=200)
-        
-        df["RSI"] = ta.momentum.rsi(df["close"], window=14)
-        macd = ta.trend.MACD(df["close"])
-        df["MACD"] = macd.macd()
-        df["MACD_SIGNAL"] = macd.macd_signal()
-        
-        bb = ta.volatility.BollingerBands(df["close"], window=20, window_dev=2)
-        df["BB_HIGH"] = bb.bollinger_hband()
-        df["BB_LOW"] = bb.bollinger_lband()
-        df["ATR"] = ta.volatility.average_true_range(df["high"], df["low"], df["close"], window=14)
-        df["ADX"] = ta.trend.adx(df["high"], df["low"], df["close"], window=14)
-
-        df.dropna(inplace=True)
-        last = df.iloc[-1]
-
-        # Calculate features for the last candle
-        features = pd.DataFrame([{
-            "ema_diff": (last["EMA20"] - last["EMA50"]) / last["close"],
-            "price_dist_ema20": (last["close"] - last["EMA20"]) / last["close"],
-            "price_dist_sma200": (last["close"] - last["SMA200"]) / last["close"],
-            "rsi": last["RSI"] / 100.0,
-            "macd_diff": (last["MACD"] - last["MACD_SIGNAL"]) / last["close"],
-            "bb_width": (last["BB_HIGH"] - last["BB_LOW"]) / last["close"],
-            "atr_ratio": last["ATR"] / last["close"],
-            "adx_ratio": last["ADX"] / 100.0
-        }])
-
-        # Predict probability of class 1 (Bullish/Up)
-        probs = model.predict_proba(features)[0]
-        bullish_prob = probs[1]
-        
-        # If bullish_prob > 0.5, we lean BULL. If < 0.5, we lean BEAR.
-        # Confidence is distance from 0.5 scaled or just the raw probability?
-        # Let's return the raw probability of it going UP.
+        # Probability of class 1 (Bullish/Up), as a raw 0-100 value.
         # The caller can decide if it's a BUY or SELL signal.
-        
-        return bullish_prob * 100
+        return float(predict_many([(symbol, timeframe, feature_vector(last))])[0])
 
     except Exception as e:
         print(f"Error predicting for {symbol}: {e}")
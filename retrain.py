@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import MODEL_MAX_AGE_HOURS, RETRAIN_LEAD_HOURS, RETRAIN_WORKERS
+from ml_model import get_model_path, train_model
+
+
+class RetrainScheduler:
+    """
+    Retrains models in the background before they expire.
+
+    Every tracked (symbol, timeframe) is retrained once its model is older than
+    MODEL_MAX_AGE_HOURS minus a staggered share of RETRAIN_LEAD_HOURS, so the
+    universe doesn't retrain all at once. Training runs on a small worker pool
+    and train_model replaces the file atomically, so queries keep using the
+    previous model until the new one is in place.
+    """
+
+    def __init__(self, pairs=(), max_age=MODEL_MAX_AGE_HOURS * 3600, lead=RETRAIN_LEAD_HOURS * 3600,
+                 workers=RETRAIN_WORKERS, interval=60):
+        self.pairs = list(pairs)
+        self.max_age = max_age
+        self.lead = lead
+        self.interval = interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retrain")
+        self.lock = threading.Lock()
+        self.jobs = {}  # (symbol, timeframe) -> status dict
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    # ================= SCHEDULING =================
+
+    def model_age(self, symbol, timeframe):
+        path = get_model_path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def due_age(self, index):
+        """Age at which the index-th tracked model is retrained (between max_age - lead and max_age)."""
+        share = index / len(self.pairs) if self.pairs else 0
+        return self.max_age - self.lead + self.lead * share
+
+    def check(self):
+        for index, (symbol, timeframe) in enumerate(self.pairs):
+            age = self.model_age(symbol, timeframe)
+            if age is None or age >= self.due_age(index):
+                self.request(symbol, timeframe)
+
+    def request(self, symbol, timeframe):
+        """Queues a retrain unless one is already queued or running. Never blocks."""
+        key = (symbol, timeframe)
+        with self.lock:
+            job = self.jobs.setdefault(key, {"state": "idle"})
+            if job["state"] in ("queued", "training"):
+                return False
+            job["state"] = "queued"
+            job["queued_at"] = time.time()
+
+        self.executor.submit(self._train, symbol, timeframe)
+        return True
+
+    def _train(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        with self.lock:
+            self.jobs[key]["state"] = "training"
+
+        start = time.time()
+        try:
+            model = train_model(symbol, timeframe)
+            error = None if model is not None else "training returned no model"
+        except Exception as e:
+            error = str(e)
+
+        with self.lock:
+            job = self.jobs[key]
+            job["state"] = "failed" if error else "idle"
+            job["last_error"] = error
+            job["last_duration"] = round(time.time() - start, 2)
+            if not error:
+                job["last_trained"] = time.time()
+
+    # ================= LIFECYCLE =================
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Retrain scheduler error: {e}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="retrain-scheduler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def track(self, symbol, timeframe):
+        with self.lock:
+            if (symbol, timeframe) not in self.pairs:
+                self.pairs.append((symbol, timeframe))
+
+    def status(self):
+        """Per-model state, age and last training result, for the admin /models command."""
+        with self.lock:
+            keys = list(dict.fromkeys(self.pairs + list(self.jobs)))
+            jobs = {key: dict(self.jobs.get(key, {"state": "idle"})) for key in keys}
+
+        for (symbol, timeframe), job in jobs.items():
+            age = self.model_age(symbol, timeframe)
+            job["age_hours"] = round(age / 3600, 2) if age is not None else None
+        return jobs
+
+
+# Process-wide scheduler; ml_model.load_or_train queues background retrains here
+scheduler = RetrainScheduler()
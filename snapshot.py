@@ -0,0 +1,94 @@
+import threading
+import time
+from candles import timeframe_ms
+from config import SYMBOLS
+from strategy import last_closed_time, scan_market
+
+# Latest market scan, rebuilt once per candle and served to every /scan
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# Held while a snapshot is being built, so concurrent callers share one scan
+_build_lock = threading.Lock()
+
+
+def seconds_until_close(timeframe="1h", delay=0):
+    """Seconds until the current candle closes, plus `delay`."""
+    tf_ms = timeframe_ms(timeframe)
+    now = int(time.time() * 1000)
+    return (now // tf_ms * tf_ms + tf_ms - now) / 1000 + delay
+
+
+def build_snapshot(symbols=SYMBOLS, timeframe="1h"):
+    """Runs the full market scan, keeps it in memory and stores it in Mongo."""
+    start = time.time()
+    results, bias = scan_market(symbols)
+    snapshot = {
+        "timeframe": timeframe,
+        "candle_time": last_closed_time(timeframe),
+        "results": [
+            {**r, "confidence": float(r["confidence"]), "bull_prob": float(r["bull_prob"]),
+             "bear_prob": float(r["bear_prob"]), "price": float(r["price"])}
+            for r in results
+        ],
+        "bias": bias,
+        "created_at": time.time(),
+        "duration": round(time.time() - start, 2),
+    }
+
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = snapshot
+
+    try:
+        from database import save_scan_snapshot
+        save_scan_snapshot(dict(snapshot))
+    except Exception as e:
+        print(f"Could not save scan snapshot: {e}")
+
+    return snapshot
+
+
+def get_snapshot(timeframe="1h", load=True):
+    """
+    The latest snapshot, falling back to the one stored in Mongo after a
+    restart (unless load=False). Returns None if neither exists or it is
+    from an older candle.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        snapshot = _snapshot
+
+    if snapshot is None and load:
+        try:
+            from database import get_latest_scan_snapshot
+            snapshot = get_latest_scan_snapshot(timeframe)
+        except Exception as e:
+            print(f"Could not load scan snapshot: {e}")
+        if snapshot is not None:
+            with _snapshot_lock:
+                _snapshot = snapshot
+
+    if snapshot is None or snapshot["candle_time"] < last_closed_time(timeframe):
+        return None
+    return snapshot
+
+
+def current_snapshot(symbols=SYMBOLS, timeframe="1h", wait=True):
+    """
+    The snapshot for the last closed candle, building it if it is missing.
+    Only one build runs at a time; callers arriving meanwhile wait for it, or
+    with wait=False get the previous snapshot while there is one.
+    """
+    snapshot = get_snapshot(timeframe, load=False)
+    if snapshot is not None:
+        return snapshot
+
+    if not wait and _build_lock.locked():
+        with _snapshot_lock:
+            previous = _snapshot
+        if previous is not None:
+            return previous
+
+    with _build_lock:
+        # Built by another caller while this one waited
+        return get_snapshot(timeframe, load=False) or build_snapshot(symbols, timeframe)
@@ -1,31 +1,17 @@
-import ccxt
+import threading
+import time
+import numpy as np
 import pandas as pd
-import ta
-from ml_model import predict_confidence
+from candles import prefetch, timeframe_ms
+from features import feature_vector, get_features, get_latest
+from ml_model import model_version, predict_confidence, predict_many
 from config import ML_WEIGHT, STRATEGY_WEIGHT, THRESHOLD_BUY, THRESHOLD_SELL
-
-exchange = ccxt.binance()
+from metrics import cache_hit, cache_miss, timed
 
 def get_indicators(symbol, timeframe="1h", limit=3000):
-    ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
-    if not ohlcv:
+    df = get_features(symbol, timeframe, limit)
+    if df.empty:
         return pd.DataFrame()
-        
-    df = pd.DataFrame(
-        ohlcv,
-        columns=["time","open","high","low","close","volume"]
-    )
-
-    # Indicators
-    df["EMA20"] = ta.trend.ema_indicator(df["close"], window=20)
-    df["EMA50"] = ta.trend.ema_indicator(df["close"], window=50)
-    df["SMA200"] = ta.trend.sma_indicator(df["close"], window=200)
-    df["RSI"] = ta.momentum.rsi(df["close"], window=14)
-    df["ADX"] = ta.trend.adx(df["high"], df["low"], df["close"], window=14)
-
-    macd = ta.trend.MACD(df["close"])
-    df["MACD"] = macd.macd()
-    df["MACD_signal"] = macd.macd_signal()
 
     return df
 
@@ -37,7 +23,10 @@ def get_technical_score(df):
     if df.empty:
         return 0
         
-    last = df.iloc[-1]
+    return technical_score(df.iloc[-1])
+
+def technical_score(last):
+    """Technical score for a single candle row (a Series or a dict of indicator values)."""
     score = 0
     
     # 1. Trend Filter (EMA Cross) - weight: 30
@@ -53,7 +42,7 @@ def get_technical_score(df):
         score -= 20
         
     # 3. MACD Confirmation - weight: 20
-    if last["MACD"] > last["MACD_signal"]:
+    if last["MACD"] > last["MACD_SIGNAL"]:
         score += 20
     else:
         score -= 20
@@ -74,57 +63,79 @@ def get_technical_score(df):
             
     return score
 
-def analyze_symbol(symbol):
+def technical_scores(df):
+    """Vectorized technical_score for every row of an indicator frame."""
+    ema_up = df["EMA20"].to_numpy() > df["EMA50"].to_numpy()
+    rsi = df["RSI"].to_numpy()
+    adx = df["ADX"].to_numpy()
+
+    return (
+        np.where(ema_up, 30, -30)
+        + np.where(rsi > 60, 20, np.where(rsi < 40, -20, 0))
+        + np.where(df["MACD"].to_numpy() > df["MACD_SIGNAL"].to_numpy(), 20, -20)
+        + np.where(df["close"].to_numpy() > df["SMA200"].to_numpy(), 20, -20)
+        + np.where(adx > 25, np.where(ema_up, 10, -10), 0)
+    )
+
+def volatility_multiplier(volatility):
+    """Scales the hybrid score down in extremely low or high volatility (scalar or array)."""
+    return np.where(
+        volatility < 0.0015, 0.5,       # extremely low volatility
+        np.where(volatility > 0.01, 0.8, 1.0)  # high volatility risk
+    )
+
+def hybrid_confidence(ml_prob, tech_score, volatility, ml_weight=ML_WEIGHT, strategy_weight=STRATEGY_WEIGHT):
+    """Fuses ML probability (0 to 100) and technical score (-100 to 100) into a 0-100 confidence."""
+    ml_score = (ml_prob - 50) * 2  # Normalize to -100 to 100
+    hybrid_score_raw = (ml_score * ml_weight) + (tech_score * strategy_weight)
+    hybrid_score = hybrid_score_raw * volatility_multiplier(volatility)
+
+    # Convert hybrid score back to 0-100 confidence for display
+    return (hybrid_score / 2) + 50
+
+def _signal(last, ml_prob):
+    """Hybrid action, confidence and price from the latest indicator row and the ML probability."""
+    current_price = last["close"]
+
+    # =============================
+    # 🔹 Technical Score (-100 to 100)
+    # =============================
+    tech_score = technical_score(last)
+    
+    # =============================
+    # 🔹 Hybrid Fusion (with volatility adjustment)
+    # =============================
+    volatility = last["VOLATILITY"]
+    display_confidence = float(hybrid_confidence(ml_prob, tech_score, volatility))
+    
+    # =============================
+    # 🔹 Action Decision
+    # =============================
+    if display_confidence >= THRESHOLD_BUY:
+        action = "BUY"
+        final_conf = display_confidence
+    elif display_confidence <= THRESHOLD_SELL:
+        action = "SELL"
+        final_conf = 100 - display_confidence
+    else:
+        action = "WAIT"
+        final_conf = abs(display_confidence - 50) * 2
+        
+    return action, round(final_conf, 2), current_price
+
+def _analyze(symbol):
     try:
         # =============================
         # 🔹 ML Prediction (0 to 100)
         # =============================
         ml_prob = predict_confidence(symbol, "1h")
-        ml_score = (ml_prob - 50) * 2  # Normalize to -100 to 100
         
-        # =============================
-        # 🔹 Technical Score (-100 to 100)
-        # =============================
-        df = get_indicators(symbol, "1h")
-        if df.empty:
+        # Streaming indicator state for the latest candle, no full recompute
+        last = get_latest(symbol, "1h")
+        if last is None:
             return "WAIT", 0, 0
             
-        current_price = df["close"].iloc[-1]
-        tech_score = get_technical_score(df)
-        
-        # =============================
-        # 🔹 Volatility Adjustment
-        # =============================
-        volatility = df["close"].pct_change().rolling(20).std().iloc[-1]
-        vol_multiplier = 1.0
-        if volatility < 0.0015:  # extremely low volatility
-            vol_multiplier = 0.5
-        elif volatility > 0.01:   # high volatility risk
-            vol_multiplier = 0.8
-            
-        # =============================
-        # 🔹 Hybrid Fusion
-        # =============================
-        hybrid_score_raw = (ml_score * ML_WEIGHT) + (tech_score * STRATEGY_WEIGHT)
-        hybrid_score = hybrid_score_raw * vol_multiplier
-        
-        # Convert hybrid score back to 0-100 confidence for display
-        display_confidence = (hybrid_score / 2) + 50
-        
-        # =============================
-        # 🔹 Action Decision
-        # =============================
-        if display_confidence >= THRESHOLD_BUY:
-            action = "BUY"
-            final_conf = display_confidence
-        elif display_confidence <= THRESHOLD_SELL:
-            action = "SELL"
-            final_conf = 100 - display_confidence
-        else:
-            action = "WAIT"
-            final_conf = abs(display_confidence - 50) * 2
-            
-        return action, round(final_conf, 2), current_price
+        return _signal(last, ml_prob)
 
     except Exception as e:
         import traceback
@@ -132,12 +143,102 @@ def analyze_symbol(symbol):
         traceback.print_exc()
         return "WAIT", 0, 0
         
+# ================= RESULT CACHE =================
+
+# (symbol, timeframe) -> (key, (action, confidence, price)); one entry per symbol
+_results = {}
+_results_lock = threading.Lock()
+
+def last_closed_time(timeframe="1h"):
+    """Open time of the most recently closed candle, from the clock alone."""
+    tf_ms = timeframe_ms(timeframe)
+    return int(time.time() * 1000) // tf_ms * tf_ms - tf_ms
+
+def _result_key(symbol, timeframe="1h"):
+    # A new closed candle, a retrained model or different weights invalidate the result
+    return (
+        last_closed_time(timeframe), model_version(symbol, timeframe),
+        ML_WEIGHT, STRATEGY_WEIGHT, THRESHOLD_BUY, THRESHOLD_SELL,
+    )
+
+def cached_result(symbol, timeframe="1h", key=None):
+    key = key or _result_key(symbol, timeframe)
+    with _results_lock:
+        entry = _results.get((symbol, timeframe))
+    if entry is not None and entry[0] == key:
+        cache_hit("result")
+        return entry[1]
+    cache_miss("result")
+    return None
+
+def store_result(symbol, result, timeframe="1h", key=None):
+    if result[2] == 0:
+        return  # WAIT, 0, 0 means analysis failed; retry on the next query
+    with _results_lock:
+        _results[(symbol, timeframe)] = (key or _result_key(symbol, timeframe), result)
+
+def clear_results():
+    with _results_lock:
+        _results.clear()
+
+@timed("analyze_symbol")
+def analyze_symbol(symbol):
+    """
+    Cached hybrid analysis: the result is reused until the next candle
+    closes, the model is retrained or the weights change.
+    """
+    key = _result_key(symbol)
+    result = cached_result(symbol, key=key)
+    if result is None:
+        result = _analyze(symbol)
+        store_result(symbol, result, key=key)
+    return result
+
+def compute_signals(symbols, keys=None):
+    """
+    (action, confidence, price) per symbol from the candles in the store,
+    scored through predict_many. Models are per symbol, so this is one
+    single-row predict_proba per symbol; what is shared is the feature row
+    from the streaming state instead of a full feature frame. Results are cached.
+    """
+    latest = {}
+    for sym in symbols:
+        try:
+            latest[sym] = get_latest(sym, "1h")
+        except Exception as e:
+            print(f"Error analyzing {sym}: {e}")
+            latest[sym] = None
+
+    # Feature rows come from the streaming state; predict_many groups them by model
+    ready = [sym for sym in symbols if latest[sym] is not None]
+    ml_probs = dict(zip(ready, predict_many([(sym, "1h", feature_vector(latest[sym])) for sym in ready])))
+
+    signals = {}
+    for sym in symbols:
+        signals[sym] = _signal(latest[sym], ml_probs[sym]) if latest[sym] is not None else ("WAIT", 0, 0)
+        store_result(sym, signals[sym], key=keys[sym] if keys else None)
+    return signals
+
+@timed("scan_market")
 def scan_market(symbols):
     results = []
     bull = bear = 0
 
+    # Results cached for the current candle need no candles or inference
+    keys = {sym: _result_key(sym) for sym in symbols}
+    signals = {sym: cached_result(sym, key=keys[sym]) for sym in symbols}
+    stale = [sym for sym in symbols if signals[sym] is None]
+
+    # Fetch the remaining symbols' candles concurrently, then score from the shared store
+    if stale:
+        try:
+            prefetch(stale, "1h")
+        except Exception as e:
+            print(f"Concurrent prefetch failed, fetching per symbol: {e}")
+        signals.update(compute_signals(stale, keys))
+
     for sym in symbols:
-        action, confidence, price = analyze_symbol(sym)
+        action, confidence, price = signals[sym]
         
         # Determine bull/bear probabilities for the display logic
         # Here confidence is "how sure we are of the action"
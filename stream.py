@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+import candles
+from config import STREAM_BATCH_DELAY
+from exchange import create_feed
+from metrics import inc, timer
+from strategy import compute_signals, last_closed_time
+
+
+class SignalEngine:
+    """
+    Keeps the latest hybrid signal for every symbol in memory.
+
+    A kline stream (ccxt.pro watch_ohlcv, or the replay feed offline) pushes
+    candle updates into the candle store; when a candle closes, the symbol's
+    streaming indicator state advances by one step and its signal is
+    recomputed. Closes arriving within STREAM_BATCH_DELAY are scored together
+    with one batched predict_proba. Queries then read signal() without
+    touching the exchange, so exchange load doesn't grow with user count.
+    """
+
+    timeframe = "1h"  # The live strategy timeframe
+
+    def __init__(self, symbols, feed=None):
+        self.symbols = list(symbols)
+        self.feed = feed
+        self.signals = {}
+        self.pending = set()
+        self.tasks = []
+        self.flush_task = None
+        self.lock = threading.Lock()
+        self.loop = None
+        self.main_task = None
+        self.thread = None
+        self.stopped = False
+
+    # ================= SIGNALS =================
+
+    def signal(self, symbol):
+        """
+        Latest signal dict (action, confidence, price, candle_time, updated_at),
+        or None when there is none for the last closed candle, e.g. while the
+        stream is reconnecting.
+        """
+        with self.lock:
+            signal = self.signals.get(symbol)
+        if signal is None:
+            return None
+        if signal["candle_time"] < last_closed_time(self.timeframe):
+            inc("stream_stale_signals")
+            return None
+        return signal
+
+    def refresh(self, symbols):
+        """Recomputes and stores the signals of `symbols` from the candle store."""
+        with timer("stream_refresh"):
+            results = compute_signals(symbols)
+
+        now = time.time()
+        tf_ms = candles.timeframe_ms(self.timeframe)
+        with self.lock:
+            for symbol, (action, confidence, price) in results.items():
+                if price == 0:
+                    continue  # Analysis failed; keep the previous signal
+                self.signals[symbol] = {
+                    "action": action,
+                    "confidence": confidence,
+                    "price": price,
+                    "candle_time": candles.last_candle_time(symbol, self.timeframe) - tf_ms,
+                    "updated_at": now,
+                }
+        inc("stream_refreshes")
+
+    async def _flush(self):
+        await asyncio.sleep(STREAM_BATCH_DELAY)
+        symbols, self.pending = sorted(self.pending), set()
+        try:
+            # Scoring may load models or fetch candles; keep it off the stream loop
+            await asyncio.to_thread(self.refresh, symbols)
+        except Exception as e:
+            print(f"Signal refresh failed: {e}")
+
+    # ================= STREAM =================
+
+    async def _watch(self, symbol):
+        delay = 1
+        while not self.stopped:
+            try:
+                rows = await self.feed.watch_ohlcv(symbol, self.timeframe)
+                delay = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Stream error for {symbol}: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+
+            try:
+                # A gap after a reconnect is backfilled over REST, so this runs off the loop too
+                closed = await asyncio.to_thread(candles.push_candles, symbol, self.timeframe, rows)
+            except Exception as e:
+                print(f"Error applying candles for {symbol}: {e}")
+                continue
+
+            if closed:
+                if not self.pending:
+                    self.flush_task = asyncio.ensure_future(self._flush())
+                self.pending.add(symbol)
+
+    async def _seed(self):
+        """Seeds the candle store and the first signals over REST, retrying with backoff until it works."""
+        delay = 1
+        while not self.stopped:
+            try:
+                await asyncio.to_thread(candles.prefetch, self.symbols, self.timeframe)
+                await asyncio.to_thread(self.refresh, self.symbols)
+                return True
+            except Exception as e:
+                print(f"Signal stream seeding failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+        return False
+
+    async def _main(self):
+        self.feed = self.feed or create_feed(candles.exchange)
+        try:
+            if await self._seed():
+                self.tasks = [asyncio.ensure_future(self._watch(symbol)) for symbol in self.symbols]
+                await asyncio.gather(*self.tasks)
+        finally:
+            # Wait for every task to finish cancelling, so none is destroyed while pending
+            tasks = [task for task in self.tasks + [self.flush_task] if task is not None]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.feed.close()
+
+    # ================= LIFECYCLE =================
+
+    def _run(self):
+        try:
+            self.loop.run_until_complete(self.main_task)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Signal stream stopped: {e}")
+        finally:
+            self.loop.close()
+
+    def start(self):
+        """Runs the stream on its own event loop thread."""
+        if self.thread is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self.main_task = self.loop.create_task(self._main())
+        self.thread = threading.Thread(target=self._run, name="signal-stream", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Cancels the stream, waits for its tasks to finish and closes the loop."""
+        self.stopped = True
+        if self.thread is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.main_task.cancel)
+        except RuntimeError:
+            pass  # The loop already finished and was closed
+        self.thread.join(timeout)
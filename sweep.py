@@ -0,0 +1,157 @@
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import hybrid_inputs, hybrid_positions, run_backtest
+from config import SYMBOLS
+
+# Per-symbol arrays from backtest.hybrid_inputs, packed as rows of one shared matrix
+FIELDS = ["close", "ml_prob", "tech_score", "volatility", "valid"]
+
+# Set in each worker process by _attach
+_shm = None
+_inputs = None
+_timeframe = None
+
+
+# ================= SHARED INPUTS =================
+
+def _pack(inputs_by_symbol):
+    """Concatenates every symbol's inputs into a (len(FIELDS), total) shared memory matrix."""
+    lengths = [len(inputs["close"]) for inputs in inputs_by_symbol]
+    offsets = np.r_[0, np.cumsum(lengths)].astype(int).tolist()
+    shape = (len(FIELDS), offsets[-1])
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    for inputs, start, end in zip(inputs_by_symbol, offsets, offsets[1:]):
+        for row, field in enumerate(FIELDS):
+            matrix[row, start:end] = inputs[field]
+
+    return shm, shape, offsets
+
+
+def _attach(shm_name, shape, offsets, timeframe):
+    """Worker initializer: maps the shared matrix once instead of pickling it per task."""
+    global _shm, _inputs, _timeframe
+    _shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=_shm.buf)
+
+    _inputs = []
+    for start, end in zip(offsets, offsets[1:]):
+        inputs = {field: matrix[row, start:end] for row, field in enumerate(FIELDS)}
+        inputs["valid"] = inputs["valid"].astype(bool)
+        _inputs.append(inputs)
+    _timeframe = timeframe
+
+
+def _evaluate(params_chunk):
+    rows = []
+    for ml_weight, strategy_weight, threshold_buy, threshold_sell in params_chunk:
+        results = [
+            run_backtest(
+                inputs["close"],
+                hybrid_positions(inputs, ml_weight, strategy_weight, threshold_buy, threshold_sell),
+                _timeframe,
+            )
+            for inputs in _inputs
+        ]
+        rows.append({
+            "ml_weight": ml_weight,
+            "strategy_weight": strategy_weight,
+            "threshold_buy": threshold_buy,
+            "threshold_sell": threshold_sell,
+            "trades": sum(r["trades"] for r in results),
+            "winrate": round(float(np.mean([r["winrate"] for r in results])), 2),
+            "pnl": round(float(np.mean([r["pnl"] for r in results])), 2),
+            "max_drawdown": max(r["max_drawdown"] for r in results),
+            "sharpe": round(float(np.mean([r["sharpe"] for r in results])), 2),
+            "exposure": round(float(np.mean([r["exposure"] for r in results])), 2),
+        })
+    return rows
+
+
+# ================= SWEEP =================
+
+def parameter_grid(ml_weights, strategy_weights, buy_thresholds, sell_thresholds):
+    return [
+        params for params in itertools.product(ml_weights, strategy_weights, buy_thresholds, sell_thresholds)
+        if params[3] < params[2]  # SELL threshold must stay below BUY threshold
+    ]
+
+
+def run_sweep(grid, symbols=SYMBOLS, timeframe="1h", limit=3000, workers=None, rank_by="sharpe", chunk_size=64):
+    """
+    Evaluates every (ml_weight, strategy_weight, threshold_buy, threshold_sell)
+    in `grid` over all symbols. Features and ML probabilities are computed once
+    per symbol and shared with the worker processes; each combination only
+    recomputes positions and backtest stats. Only candles after each model's
+    training window are replayed, so high ML weights aren't rewarded for a
+    forest recalling its own training rows. Returns a DataFrame ranked by `rank_by`.
+    """
+    inputs_by_symbol = []
+    for sym in symbols:
+        # Offline: train missing models here rather than replaying without one
+        inputs = hybrid_inputs(sym, timeframe, limit, background=False)
+        if len(inputs["close"]) < 2:
+            print(f"Skipping {sym}: no out-of-sample candles after the model's training window")
+            continue
+        print(f"{sym}: {len(inputs['close'])} out-of-sample candles")
+        inputs_by_symbol.append(inputs)
+    if not inputs_by_symbol:
+        return pd.DataFrame()
+
+    shm, shape, offsets = _pack(inputs_by_symbol)
+
+    try:
+        chunks = [grid[i:i + chunk_size] for i in range(0, len(grid), chunk_size)]
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_attach,
+            initargs=(shm.name, shape, offsets, timeframe),
+        ) as executor:
+            rows = [row for chunk_rows in executor.map(_evaluate, chunks) for row in chunk_rows]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    results = pd.DataFrame(rows)
+    if results.empty:
+        return results
+    return results.sort_values(rank_by, ascending=False).reset_index(drop=True)
+
+
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid search over hybrid strategy weights and thresholds")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--timeframe", default="1h")
+    parser.add_argument("--limit", type=int, default=3000)
+    parser.add_argument("--ml-weights", type=_floats, default=[round(w, 1) for w in np.arange(0, 1.01, 0.1)])
+    parser.add_argument("--strategy-weights", type=_floats, default=[round(w, 1) for w in np.arange(0, 1.01, 0.1)])
+    parser.add_argument("--buy-thresholds", type=_floats, default=[55, 60, 65, 70, 75, 80])
+    parser.add_argument("--sell-thresholds", type=_floats, default=[20, 25, 30, 35, 40, 45])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank-by", default="sharpe")
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = parameter_grid(args.ml_weights, args.strategy_weights, args.buy_thresholds, args.sell_thresholds)
+    print(f"Evaluating {len(grid)} parameter combinations...")
+
+    start = time.time()
+    results = run_sweep(grid, args.symbols.split(","), args.timeframe, args.limit, args.workers, args.rank_by)
+    print(f"Done in {round(time.time() - start, 2)}s")
+
+    results.to_csv(args.out, index=False)
+    print(results.head(10).to_string())
+    print(f"Saved ranked results to {args.out}")
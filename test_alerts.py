@@ -0,0 +1,68 @@
+import alerts
+
+
+def setup_function():
+    alerts._last_actions.clear()
+
+
+def snapshot(*rows):
+    return {"results": [
+        {"symbol": symbol, "action": action, "confidence": 70.0, "price": price} for symbol, action, price in rows
+    ]}
+
+
+def step(snap):
+    """One snapshot_loop round: compare, then commit the baseline."""
+    changes = alerts.action_changes(snap)
+    alerts.commit(snap)
+    return changes
+
+
+def test_first_snapshot_only_sets_the_baseline():
+    assert step(snapshot(("BTC/USDT", "BUY", 1.0), ("ETH/USDT", "WAIT", 1.0))) == []
+    assert alerts._last_actions == {"BTC/USDT": "BUY", "ETH/USDT": "WAIT"}
+
+
+def test_change_alerts_once():
+    step(snapshot(("BTC/USDT", "WAIT", 1.0)))
+
+    changes = step(snapshot(("BTC/USDT", "BUY", 1.0)))
+    assert [(symbol, previous, r["action"]) for symbol, previous, r in changes] == [("BTC/USDT", "WAIT", "BUY")]
+    assert step(snapshot(("BTC/USDT", "BUY", 1.0))) == []
+
+
+def test_failed_analyses_are_ignored():
+    step(snapshot(("BTC/USDT", "WAIT", 1.0)))
+
+    # A price of 0 means the analysis failed; it neither alerts nor moves the baseline
+    assert step(snapshot(("BTC/USDT", "SELL", 0))) == []
+    assert step(snapshot(("BTC/USDT", "WAIT", 1.0))) == []
+
+    alerts.seed(snapshot(("ETH/USDT", "SELL", 0)))
+    assert "ETH/USDT" not in alerts._last_actions
+
+
+def test_seed_keeps_known_actions_quiet():
+    alerts.seed(snapshot(("BTC/USDT", "BUY", 1.0)))
+    assert step(snapshot(("BTC/USDT", "BUY", 1.0))) == []
+
+
+def test_one_message_per_approved_subscriber():
+    step(snapshot(("BTC/USDT", "WAIT", 1.0), ("ETH/USDT", "WAIT", 1.0)))
+    changes = step(snapshot(("BTC/USDT", "BUY", 1.0), ("ETH/USDT", "SELL", 1.0)))
+
+    subscribers = {"BTC/USDT": {1, 2, 3}, "ETH/USDT": {1}}
+    messages = alerts.alert_messages(changes, subscribers, allowed={1, 2})
+
+    assert set(messages) == {1, 2}  # 3 is not approved
+    assert "BTC/USDT: WAIT → BUY" in messages[1] and "ETH/USDT: WAIT → SELL" in messages[1]
+    assert "ETH/USDT" not in messages[2]
+
+
+def test_uncommitted_changes_alert_again():
+    step(snapshot(("BTC/USDT", "WAIT", 1.0)))
+
+    # The subscriber lookup failed: nothing was committed, so the next snapshot still alerts
+    assert len(alerts.action_changes(snapshot(("BTC/USDT", "BUY", 1.0)))) == 1
+    assert len(step(snapshot(("BTC/USDT", "BUY", 1.0)))) == 1
+    assert step(snapshot(("BTC/USDT", "BUY", 1.0))) == []
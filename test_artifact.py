@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from artifact import load_artifact, save_artifact
+from features import FEATURE_COLS
+
+
+def make_pipeline(seed=3):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(500, len(FEATURE_COLS)))
+    y = (X[:, 0] + rng.normal(scale=0.5, size=500) > 0).astype(int)
+    pipeline = Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", RandomForestClassifier(n_estimators=20, max_depth=6, random_state=42))
+    ])
+    return pipeline.fit(X, y), X
+
+
+def test_artifact_matches_pipeline(tmp_path):
+    pipeline, X = make_pipeline()
+    path = str(tmp_path / "model.mfm")
+    save_artifact(pipeline, path, FEATURE_COLS, {"n_samples": len(X)})
+
+    model = load_artifact(path, verify=True)
+    np.testing.assert_array_equal(model.predict_proba(X), pipeline.predict_proba(X))
+    assert model.header["feature_cols"] == FEATURE_COLS
+    assert isinstance(model.threshold, np.memmap)
+
+
+def test_reduced_precision_is_close(tmp_path):
+    pipeline, X = make_pipeline()
+    path = str(tmp_path / "model.mfm")
+    save_artifact(pipeline, path, FEATURE_COLS, precision="float32")
+
+    np.testing.assert_allclose(load_artifact(path).predict_proba(X), pipeline.predict_proba(X), atol=1e-3)
+
+
+def test_concurrent_saves_of_one_model(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    pipeline, X = make_pipeline()
+    path = str(tmp_path / "model.mfm")
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: save_artifact(pipeline, path, FEATURE_COLS), range(32)))
+
+    np.testing.assert_array_equal(load_artifact(path, verify=True).predict_proba(X), pipeline.predict_proba(X))
+    assert os.listdir(tmp_path) == ["model.mfm"]
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+import backtest
+from artifact import load_artifact, save_artifact
+from backtest import run_backtest, simple_scores
+from features import FEATURE_COLS, INDICATOR_COLS, add_indicators, add_ml_features
+from test_indicators import make_candles
+
+
+def loop_backtest(df):
+    """Reference per-row implementation the vectorized engine must reproduce."""
+    wins = losses = trades = 0
+    for i in range(50, len(df) - 1):
+        row = df.iloc[i]
+        next_row = df.iloc[i + 1]
+
+        score = 0
+        if row["EMA20"] > row["EMA50"]:
+            score += 1
+        if row["close"] > row["EMA20"]:
+            score += 1
+        if row["RSI"] > 50:
+            score += 1
+        if row["MACD"] > 0:
+            score += 1
+
+        if score >= 3:
+            trades += 1
+            if next_row["close"] > row["close"]:
+                wins += 1
+            else:
+                losses += 1
+    return trades, wins, losses
+
+
+def test_vectorized_matches_loop():
+    df = add_indicators(make_candles(800))
+    position = (simple_scores(df) >= 3).astype(int)
+    position[:50] = 0
+
+    res = run_backtest(df["close"], position, "4h")
+    assert (res["trades"], res["wins"], res["losses"]) == loop_backtest(df)
+
+
+def test_short_positions_and_drawdown():
+    close = pd.Series([100.0, 110.0, 99.0, 99.0])
+    res = run_backtest(close, np.array([-1, 1, 1, 0]), "1h")
+
+    assert (res["trades"], res["wins"], res["losses"]) == (3, 0, 3)
+    assert res["pnl"] == round(((0.9) * (0.9) - 1) * 100, 2)
+    assert res["max_drawdown"] == 19.0
+    assert res["exposure"] == 100.0
+
+
+def test_vectorized_technical_score_matches_live():
+    from strategy import technical_score, technical_scores
+
+    df = add_indicators(make_candles(600))
+    expected = [technical_score(row) for _, row in df.iterrows()]
+    assert list(technical_scores(df)) == expected
+
+
+def test_hybrid_replay_skips_the_training_window(tmp_path, monkeypatch):
+    from ml_model import _pipeline
+
+    df = add_ml_features(add_indicators(make_candles(1500)))
+    train = df.dropna(subset=INDICATOR_COLS).iloc[:-1].head(1000)
+    pipeline = _pipeline(1).fit(train[FEATURE_COLS], (train["close"].shift(-1) > train["close"]).astype(int))
+    end = int(train["time"].iloc[-1])
+    path = str(tmp_path / "model.mfm")
+    save_artifact(pipeline, path, FEATURE_COLS, {"start": int(train["time"].iloc[0]), "end": end})
+
+    monkeypatch.setattr(backtest, "get_features", lambda *args: df.copy())
+    monkeypatch.setattr(backtest, "load_or_train", lambda *args, **kwargs: load_artifact(path))
+
+    inputs = backtest.hybrid_inputs("BTC/USDT", "1h", 1500)
+    position = backtest.hybrid_positions(inputs, ml_weight=1, strategy_weight=0)
+
+    # No candle the model was fit on gets a position
+    assert (inputs["time"] > end).all()
+    assert len(position) == (df["time"] > end).sum()
+    assert backtest.backtest_hybrid("BTC/USDT")["candles"] == len(position)
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+import candles
+from exchange import ReplayExchange, synthetic_candles, write_fixture
+
+HOUR_MS = 3_600_000
+
+
+class RecordingReplay(ReplayExchange):
+    """ReplayExchange that remembers the `since` of every request."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        self.calls.append(since)
+        return super().fetch_ohlcv(symbol, timeframe, since, limit, params)
+
+
+@pytest.fixture
+def replay(tmp_path, monkeypatch):
+    write_fixture("BTC/USDT", "1h", synthetic_candles(2500, "1h"), str(tmp_path / "fixtures"))
+    replay = RecordingReplay(fixture_dir=str(tmp_path / "fixtures"))
+    monkeypatch.setattr(candles, "exchange", replay)
+    monkeypatch.setattr(candles, "DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setattr(candles, "CANDLE_ARCHIVE", True)
+    monkeypatch.setattr(candles, "CANDLES_OFFLINE", False)
+    candles.clear_cache()
+    yield replay
+    candles.clear_cache()
+
+
+def assert_contiguous(df):
+    assert (np.diff(df["time"].to_numpy()) == HOUR_MS).all()
+
+
+def test_expired_entry_fetches_from_the_open_candle(replay):
+    df = candles.get_ohlcv("BTC/USDT", "1h", 500)
+    assert len(df) == 500
+
+    # Fresh entries are served without a request
+    candles.get_ohlcv("BTC/USDT", "1h", 500)
+    requests = len(replay.calls)
+
+    candles._store[("BTC/USDT", "1h")]["expires_at"] = 0
+    refreshed = candles.get_ohlcv("BTC/USDT", "1h", 500)
+
+    assert len(replay.calls) == requests + 1
+    assert replay.calls[-1] == df["time"].iloc[-1]
+    assert refreshed.equals(df)
+
+
+def test_larger_limit_than_stored(replay):
+    candles.get_ohlcv("BTC/USDT", "1h", 100)
+    df = candles.get_ohlcv("BTC/USDT", "1h", 1500)
+
+    assert len(df) == 1500
+    assert_contiguous(df)
+    assert candles.get_ohlcv("BTC/USDT", "1h", 100).equals(df.tail(100).reset_index(drop=True))
+
+
+def test_cold_start_continues_a_short_archive(replay):
+    full = candles.get_ohlcv("BTC/USDT", "1h", 2000)
+
+    # Keep only the oldest 200 archived candles, as if the bot was down for a while
+    candles.clear_cache()
+    with open(candles.archive_path("BTC/USDT", "1h"), "r+b") as f:
+        f.truncate(200 * 6 * 8)
+    requests = len(replay.calls)
+
+    df = candles.get_ohlcv("BTC/USDT", "1h", 300)
+    assert replay.calls[requests] == full["time"].iloc[199]  # Resumed from the archive's last candle
+    assert df.equals(full.tail(300).reset_index(drop=True))
+
+    archived = candles.read_archive("BTC/USDT", "1h")
+    assert len(archived) == 2000
+    assert_contiguous(archived)
+
+
+def test_offline_reads_the_archive_only(replay, monkeypatch):
+    full = candles.get_ohlcv("BTC/USDT", "1h", 800)
+    requests = len(replay.calls)
+
+    monkeypatch.setattr(candles, "CANDLES_OFFLINE", True)
+    candles.clear_cache()
+
+    df = candles.get_ohlcv("BTC/USDT", "1h", 300)
+    assert df.equals(full.tail(300).reset_index(drop=True))
+    # More than archived returns what there is
+    assert len(candles.get_ohlcv("BTC/USDT", "1h", 5000)) == 800
+    assert len(replay.calls) == requests
+    assert candles._store[("BTC/USDT", "1h")]["expires_at"] == float("inf")
+
+
+def test_push_candles_backfills_a_gap(replay):
+    full = candles.get_ohlcv("BTC/USDT", "1h", 500)
+
+    # The stream missed the last few candles while disconnected
+    entry = candles._store[("BTC/USDT", "1h")]
+    entry["df"] = full.iloc[:-5].reset_index(drop=True)
+    requests = len(replay.calls)
+
+    rows = [[int(row[0]), *row[1:]] for row in full.tail(2).values.tolist()]
+    assert candles.push_candles("BTC/USDT", "1h", rows)
+
+    assert len(replay.calls) == requests + 1
+    assert replay.calls[-1] == full["time"].iloc[-6]
+    df = candles.get_ohlcv("BTC/USDT", "1h", 500)
+    assert df.equals(full)
+
+    # A repeated update of the open candle is not a close
+    assert not candles.push_candles("BTC/USDT", "1h", rows[-1:])
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import database
+from config import ADMIN_ID
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def setup_function():
+    database.connect(mongomock.MongoClient())
+
+
+def test_init_creates_indexes_and_admin():
+    database.init_db()
+
+    indexes = database.collection("users").index_information()
+    assert any(index["key"] == [("user_id", 1)] and index.get("unique") for index in indexes.values())
+    assert any(index["key"] == [("symbol", 1), ("timeframe", 1)]
+               for index in database.collection("models").index_information().values())
+    assert database.is_user_approved(ADMIN_ID)
+
+
+def test_async_access():
+    async def scenario():
+        await database.init_db_async()
+        await database.add_user_async(42)
+        return await database.get_approved_users_async()
+
+    assert {ADMIN_ID, 42} <= asyncio.run(scenario())
+
+
+def test_history_is_batched():
+    for i in range(5):
+        database.log_history("query", {"i": i})
+    database.flush_history()
+
+    events = list(database.collection("history").find({"event_type": "query"}).sort("data.i"))
+    assert [event["data"]["i"] for event in events] == list(range(5))
+
+
+def test_failed_history_flush_keeps_the_batch(monkeypatch):
+    class Down:
+        calls = 0
+
+        def insert_many(self, batch, ordered=True):
+            Down.calls += 1
+            raise RuntimeError("server selection timeout")
+
+    writer = database.HistoryWriter("history", batch_size=10, max_size=30)
+    writer.stopped = True  # No background thread; flushed by hand
+    for i in range(35):
+        writer.add({"i": i})
+
+    monkeypatch.setattr(database, "collection", lambda name: Down())
+    assert writer.flush() == 0
+    assert Down.calls == 1
+    assert [e["i"] for e in writer.buffer] == list(range(5, 35))
+
+    monkeypatch.undo()
+    assert writer.flush() == 30
+    assert [e["i"] for e in database.collection("history").find().sort("i")] == list(range(5, 35))
+
+
+def test_subscriptions():
+    assert database.subscribe(1, "BTC/USDT")
+    assert not database.subscribe(1, "BTC/USDT")
+    database.subscribe(1, "ETH/USDT")
+    database.subscribe(2, "BTC/USDT")
+
+    assert database.get_user_subscriptions(1) == ["BTC/USDT", "ETH/USDT"]
+    assert database.get_subscribers_by_symbol() == {"BTC/USDT": {1, 2}, "ETH/USDT": {1}}
+
+    assert database.unsubscribe(1) == 2
+    assert database.get_subscribers_by_symbol() == {"BTC/USDT": {2}}
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+import evaluate
+from evaluate import calibration, fold_windows
+
+
+@pytest.mark.parametrize("expanding", [False, True])
+def test_folds_never_train_on_their_test_rows(expanding, monkeypatch):
+    windows = fold_windows(1000, train_size=300, test_size=100, step=150, expanding=expanding)
+    assert windows
+
+    fitted = []
+
+    class Spy:
+        def fit(self, X, y):
+            fitted.append(X[:, 0].astype(int))
+            return self
+
+        def predict_proba(self, X):
+            return np.full((len(X), 2), 0.5)
+
+    monkeypatch.setattr(evaluate, "_pipeline", lambda n_jobs=None: Spy())
+    # Column 0 holds the row index, so the fitted rows can be checked
+    evaluate._attach(np.column_stack([np.arange(1000), np.arange(1000) % 2]).astype(float))
+
+    for train_start, test_start, test_end in windows:
+        evaluate._evaluate_fold((train_start, test_start, test_end))
+        rows = fitted[-1]
+        assert rows.max() < test_start
+        assert test_end <= 1000
+        assert rows.min() == (0 if expanding else test_start - 300)
+        assert len(rows) == (test_start if expanding else 300)
+
+
+def test_calibration_arithmetic():
+    y = np.array([0, 1, 1, 0])
+    prob = np.array([0.1, 0.9, 0.8, 0.3])
+    brier, ece, table = calibration(y, prob, bins=2)
+
+    assert brier == round((0.01 + 0.01 + 0.04 + 0.09) / 4, 4)
+    # Bin 0: mean 0.2 vs frequency 0; bin 1: mean 0.85 vs frequency 1; half the rows each
+    assert ece == round(0.5 * 0.2 + 0.5 * 0.15, 4)
+    assert [(row["count"], row["mean_prob"], row["frequency"]) for row in table] == [(2, 0.2, 0.0), (2, 0.85, 1.0)]
@@ -0,0 +1,46 @@
+import time
+
+import ccxt
+import pytest
+
+from exchange import ReplayExchange, synthetic_candles, write_fixture
+
+HOUR_MS = 3_600_000
+
+
+def make_replay(tmp_path, n=2500, **kwargs):
+    write_fixture("BTC/USDT", "1h", synthetic_candles(n, "1h"), str(tmp_path))
+    return ReplayExchange(fixture_dir=str(tmp_path), **kwargs)
+
+
+def test_replay_pages_up_to_the_open_candle(tmp_path):
+    replay = make_replay(tmp_path)
+    now = time.time() * 1000
+
+    latest = replay.fetch_ohlcv("BTC/USDT", "1h", limit=100)
+    assert len(latest) == 100
+    assert latest[-1][0] <= now < latest[-1][0] + HOUR_MS
+
+    # Paging forward from `since` returns the whole history exactly once
+    since, rows = latest[-1][0] - 2499 * HOUR_MS, []
+    while True:
+        page = replay.fetch_ohlcv("BTC/USDT", "1h", since=since, limit=1000)
+        rows.extend(page)
+        if len(page) < 1000:
+            break
+        since = page[-1][0] + 1
+    assert len(rows) == 2500
+    assert rows[-1] == latest[-1]
+
+
+def test_replay_rate_limit(tmp_path):
+    replay = make_replay(tmp_path, rate_limit=10)
+    replay.fetch_ohlcv("BTC/USDT", "1h", limit=1000)  # weight 5
+    replay.fetch_ohlcv("BTC/USDT", "1h", limit=1000)
+    with pytest.raises(ccxt.RateLimitExceeded):
+        replay.fetch_ohlcv("BTC/USDT", "1h", limit=1000)
+
+
+def test_missing_fixture(tmp_path):
+    with pytest.raises(ccxt.BadSymbol):
+        ReplayExchange(fixture_dir=str(tmp_path)).fetch_ohlcv("ETH/USDT", "1h")
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from exchange import synthetic_candles
+from features import INDICATOR_COLS, add_indicators
+from indicators import IndicatorState
+
+
+def make_candles(n=1500, seed=7):
+    df = pd.DataFrame(synthetic_candles(n, "1h", seed), columns=["time", "open", "high", "low", "close", "volume"])
+    df["time"] = df["time"].astype("int64")
+    return df
+
+
+def test_streaming_matches_ta():
+    candles = make_candles()
+    expected = add_indicators(candles.copy())
+
+    state = IndicatorState()
+    streamed = pd.DataFrame([state.update(c) for c in candles.to_dict("records")])
+
+    for col in INDICATOR_COLS:
+        np.testing.assert_allclose(streamed[col], expected[col], rtol=1e-9, atol=1e-9, err_msg=col)
+
+
+def test_open_candle_does_not_change_state():
+    candles = make_candles(300)
+    state = IndicatorState()
+    for c in candles.iloc[:-1].to_dict("records"):
+        state.update(c)
+
+    last = candles.iloc[-1].to_dict()
+    preview = state.update(last, commit=False)
+    assert state.update(last, commit=False) == preview
+    assert state.update(last) == preview
+
+
+def test_latest_state_is_kept_per_limit(monkeypatch):
+    import features
+
+    candles = make_candles(1000)
+    monkeypatch.setattr(features, "get_ohlcv", lambda symbol, timeframe, limit: candles.tail(limit).reset_index(drop=True))
+    monkeypatch.setattr(features, "_states", {})
+
+    # A short history can't warm up SMA200; it must not seed the state of longer callers
+    assert np.isnan(features.get_latest("BTC/USDT", "1h", 150)["SMA200"])
+    latest = features.get_latest("BTC/USDT", "1h", 1000)
+    np.testing.assert_allclose(latest["SMA200"], add_indicators(candles.copy())["SMA200"].iloc[-1], rtol=1e-9)
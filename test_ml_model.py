@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+
+import ml_model
+from artifact import save_artifact
+from features import FEATURE_COLS
+from test_artifact import make_pipeline
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    # Model paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("models")
+    ml_model._registry.clear()
+    yield tmp_path
+    ml_model._registry.clear()
+
+
+def install(symbol, seed=3, timeframe="1h"):
+    pipeline, X = make_pipeline(seed)
+    save_artifact(pipeline, ml_model.get_model_path(symbol, timeframe), FEATURE_COLS)
+    return pipeline, X
+
+
+def test_registry_evicts_least_recently_used(models_dir, monkeypatch):
+    monkeypatch.setattr(ml_model, "MODEL_CACHE_SIZE", 2)
+    for symbol in ("BTC/USDT", "ETH/USDT", "SOL/USDT"):
+        install(symbol)
+
+    btc = ml_model.get_model("BTC/USDT")
+    ml_model.get_model("ETH/USDT")
+    assert ml_model.get_model("BTC/USDT") is btc  # Served from memory, now most recently used
+    ml_model.get_model("SOL/USDT")
+
+    assert list(ml_model._registry) == [("BTC/USDT", "1h"), ("SOL/USDT", "1h")]
+
+
+def test_registry_reloads_a_changed_file(models_dir):
+    install("BTC/USDT", seed=3)
+    old = ml_model.get_model("BTC/USDT")
+    assert ml_model.get_model("BTC/USDT") is old
+
+    pipeline, X = install("BTC/USDT", seed=4)
+    stat = os.stat(ml_model.get_model_path("BTC/USDT", "1h"))
+    os.utime(ml_model.get_model_path("BTC/USDT", "1h"), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    new = ml_model.get_model("BTC/USDT")
+    assert new is not old
+    assert (new.predict_proba(X) == pipeline.predict_proba(X)).all()
+
+
+def test_models_with_other_features_are_retrained(models_dir, monkeypatch):
+    import retrain
+
+    pipeline, _ = make_pipeline()
+    save_artifact(pipeline, ml_model.get_model_path("BTC/USDT", "1h"), FEATURE_COLS[::-1])
+    with pytest.raises(ValueError):
+        ml_model.get_model("BTC/USDT")
+
+    requested = []
+    monkeypatch.setattr(retrain.scheduler, "request", lambda symbol, timeframe: requested.append(symbol))
+    assert ml_model.load_or_train("BTC/USDT", "1h", background=True) is None
+    assert requested == ["BTC/USDT"]
+    assert ("BTC/USDT", "1h") not in ml_model._registry
+
+
+class CountingModel:
+    """predict_proba stand-in returning each row's first feature as the bullish probability."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        return np.column_stack([1 - X[:, 0], X[:, 0]])
+
+
+def test_predict_many(monkeypatch):
+    models = {"BTC/USDT": CountingModel(), "ETH/USDT": CountingModel()}
+    monkeypatch.setattr(ml_model, "load_or_train", lambda symbol, timeframe, background=False: models.get(symbol))
+
+    def row(value):
+        return np.full(len(FEATURE_COLS), value)
+
+    probs = ml_model.predict_many([
+        ("BTC/USDT", "1h", row(0.1)),
+        ("ETH/USDT", "1h", row(0.2)),
+        ("SOL/USDT", "1h", row(0.3)),  # No model
+        ("BTC/USDT", "1h", row(np.nan)),  # NaN features
+        ("BTC/USDT", "1h", row(0.4)),
+    ])
+
+    # Request order is kept; missing models and NaN rows are neutral
+    np.testing.assert_allclose(probs, [10, 20, 50, 50, 40])
+    # Rows sharing a model are scored in one call
+    assert models["BTC/USDT"].calls == [2]
+    assert models["ETH/USDT"].calls == [1]
@@ -0,0 +1,70 @@
+import threading
+
+import retrain
+from retrain import RetrainScheduler
+
+PAIRS = [("BTC/USDT", "1h"), ("ETH/USDT", "1h"), ("SOL/USDT", "1h"), ("XRP/USDT", "1h")]
+
+
+def test_due_ages_are_staggered_over_the_lead(monkeypatch):
+    scheduler = RetrainScheduler(PAIRS, max_age=100, lead=20)
+    assert [scheduler.due_age(i) for i in range(4)] == [80, 85, 90, 95]
+
+    ages = {"BTC/USDT": 81, "ETH/USDT": 84, "SOL/USDT": None, "XRP/USDT": 99}
+    monkeypatch.setattr(scheduler, "model_age", lambda symbol, timeframe: ages[symbol])
+    requested = []
+    monkeypatch.setattr(scheduler, "request", lambda symbol, timeframe: requested.append(symbol))
+
+    scheduler.check()
+    # ETH is not due until 85; a missing model is always due
+    assert requested == ["BTC/USDT", "SOL/USDT", "XRP/USDT"]
+
+
+def test_duplicate_requests_are_ignored(monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def train_model(symbol, timeframe):
+        calls.append(symbol)
+        started.set()
+        release.wait(5)
+        return object()
+
+    monkeypatch.setattr(retrain, "train_model", train_model)
+    scheduler = RetrainScheduler(workers=1)
+
+    assert scheduler.request("BTC/USDT", "1h")
+    assert not scheduler.request("BTC/USDT", "1h")  # Queued
+    started.wait(5)
+    assert scheduler.jobs[("BTC/USDT", "1h")]["state"] == "training"
+    assert not scheduler.request("BTC/USDT", "1h")  # Training
+
+    release.set()
+    scheduler.executor.shutdown(wait=True)
+    assert calls == ["BTC/USDT"]
+    assert scheduler.jobs[("BTC/USDT", "1h")]["state"] == "idle"
+
+
+def test_failures_are_reported(monkeypatch):
+    results = {"BTC/USDT": None, "ETH/USDT": RuntimeError("exchange down"), "SOL/USDT": object()}
+
+    def train_model(symbol, timeframe):
+        if isinstance(results[symbol], Exception):
+            raise results[symbol]
+        return results[symbol]
+
+    monkeypatch.setattr(retrain, "train_model", train_model)
+    scheduler = RetrainScheduler(PAIRS[:3])
+    monkeypatch.setattr(scheduler, "model_age", lambda symbol, timeframe: None)
+    for symbol in results:
+        scheduler.request(symbol, "1h")
+    scheduler.executor.shutdown(wait=True)
+
+    status = scheduler.status()
+    assert status[("BTC/USDT", "1h")]["state"] == "failed"
+    assert status[("BTC/USDT", "1h")]["last_error"] == "training returned no model"
+    assert status[("ETH/USDT", "1h")]["last_error"] == "exchange down"
+    assert status[("SOL/USDT", "1h")]["state"] == "idle"
+    assert "last_trained" in status[("SOL/USDT", "1h")]
+    assert status[("SOL/USDT", "1h")]["age_hours"] is None
@@ -0,0 +1,41 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import snapshot
+
+
+def test_concurrent_callers_share_one_build(monkeypatch):
+    builds = []
+    release = threading.Event()
+
+    def scan_market(symbols):
+        builds.append(symbols)
+        release.wait(5)
+        return [], "NEUTRAL"
+
+    closed = [1000]
+    monkeypatch.setattr(snapshot, "scan_market", scan_market)
+    monkeypatch.setattr(snapshot, "last_closed_time", lambda timeframe="1h": closed[0])
+    monkeypatch.setattr(database, "save_scan_snapshot", lambda doc: None)
+    monkeypatch.setattr(snapshot, "_snapshot", None)
+
+    with ThreadPoolExecutor(4) as pool:
+        waiting = [pool.submit(snapshot.current_snapshot, ["BTC/USDT"]) for _ in range(4)]
+        time.sleep(0.1)
+        release.set()
+        first = [future.result() for future in waiting]
+    assert len(builds) == 1
+    assert all(s is first[0] for s in first)
+
+    # After the next close, callers that don't wait get the previous snapshot during the rebuild
+    closed[0] = 2000
+    release.clear()
+    with ThreadPoolExecutor(2) as pool:
+        rebuild = pool.submit(snapshot.current_snapshot, ["BTC/USDT"])
+        time.sleep(0.1)
+        assert snapshot.current_snapshot(["BTC/USDT"], wait=False) is first[0]
+        release.set()
+        assert rebuild.result()["candle_time"] == 2000
+    assert len(builds) == 2
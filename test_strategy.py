@@ -0,0 +1,63 @@
+import pytest
+
+import strategy
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    state = {"closed": 1000, "version": (1, 100)}
+    monkeypatch.setattr(strategy, "last_closed_time", lambda timeframe="1h": state["closed"])
+    monkeypatch.setattr(strategy, "model_version", lambda symbol, timeframe: state["version"])
+    strategy.clear_results()
+    yield state
+    strategy.clear_results()
+
+
+def test_results_are_cached_per_candle_and_model(clock, monkeypatch):
+    calls = []
+    monkeypatch.setattr(strategy, "_analyze", lambda symbol: calls.append(symbol) or ("BUY", 70.0, 1.5))
+
+    strategy.analyze_symbol("BTC/USDT")
+    strategy.analyze_symbol("BTC/USDT")
+    assert len(calls) == 1
+
+    clock["closed"] = 2000  # The next candle closed
+    strategy.analyze_symbol("BTC/USDT")
+    assert len(calls) == 2
+
+    clock["version"] = (2, 100)  # The model was retrained
+    strategy.analyze_symbol("BTC/USDT")
+    strategy.analyze_symbol("BTC/USDT")
+    assert len(calls) == 3
+
+
+def test_failed_analyses_are_not_cached(clock, monkeypatch):
+    calls = []
+    monkeypatch.setattr(strategy, "_analyze", lambda symbol: calls.append(symbol) or ("WAIT", 0, 0))
+
+    assert strategy.analyze_symbol("BTC/USDT") == ("WAIT", 0, 0)
+    strategy.analyze_symbol("BTC/USDT")
+    assert len(calls) == 2
+    assert strategy.cached_result("BTC/USDT") is None
+
+
+def test_scan_only_computes_cache_misses(clock, monkeypatch):
+    strategy.store_result("BTC/USDT", ("BUY", 70.0, 1.5))
+    prefetched, computed = [], []
+    monkeypatch.setattr(strategy, "prefetch", lambda symbols, timeframe: prefetched.append(list(symbols)))
+
+    def compute_signals(symbols, keys=None):
+        computed.append(list(symbols))
+        return {sym: ("SELL", 60.0, 2.0) for sym in symbols}
+
+    monkeypatch.setattr(strategy, "compute_signals", compute_signals)
+
+    results, _ = strategy.scan_market(["BTC/USDT", "ETH/USDT"])
+    assert prefetched == [["ETH/USDT"]]
+    assert computed == [["ETH/USDT"]]
+    assert [r["action"] for r in results] == ["BUY", "SELL"]
+
+    # Everything cached: no candles and no inference
+    strategy.store_result("ETH/USDT", ("SELL", 60.0, 2.0))
+    strategy.scan_market(["BTC/USDT", "ETH/USDT"])
+    assert len(prefetched) == len(computed) == 1
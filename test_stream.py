@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import stream
+from stream import SignalEngine
+
+HOUR_MS = 3_600_000
+
+
+def test_stale_signals_are_not_served(monkeypatch):
+    monkeypatch.setattr(stream, "last_closed_time", lambda timeframe="1h": 10 * HOUR_MS)
+    engine = SignalEngine(["BTC/USDT"])
+    engine.signals["BTC/USDT"] = {"action": "BUY", "confidence": 70.0, "price": 1.0, "candle_time": 10 * HOUR_MS}
+    assert engine.signal("BTC/USDT")["action"] == "BUY"
+
+    # The feed stopped delivering: the next candle closed without a refresh
+    monkeypatch.setattr(stream, "last_closed_time", lambda timeframe="1h": 11 * HOUR_MS)
+    assert engine.signal("BTC/USDT") is None
+    assert engine.signal("ETH/USDT") is None
+
+
+class IdleFeed:
+    def __init__(self):
+        self.closed = False
+
+    async def watch_ohlcv(self, symbol, timeframe):
+        await asyncio.sleep(60)
+
+    async def close(self):
+        self.closed = True
+
+
+def test_seeding_is_retried_and_stop_cleans_up(monkeypatch):
+    attempts = []
+
+    def prefetch(symbols, timeframe):
+        attempts.append(symbols)
+        if len(attempts) == 1:
+            raise RuntimeError("load_markets failed")
+
+    monkeypatch.setattr(stream.candles, "prefetch", prefetch)
+    monkeypatch.setattr(SignalEngine, "refresh", lambda self, symbols: None)
+
+    feed = IdleFeed()
+    engine = SignalEngine(["BTC/USDT", "ETH/USDT"], feed=feed)
+    engine.start()
+    for _ in range(50):
+        if len(engine.tasks) == 2:
+            break
+        time.sleep(0.1)
+    assert len(attempts) == 2
+    assert len(engine.tasks) == 2
+
+    engine.stop()
+    assert not engine.thread.is_alive()
+    assert engine.loop.is_closed()
+    assert all(task.cancelled() for task in engine.tasks)
+    assert feed.closed
@@ -0,0 +1,29 @@
+import argparse
+import time
+from config import SYMBOLS
+from ml_model import train_all
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train every symbol x timeframe model in parallel")
+    parser.add_argument("--symbols", default=",".join(SYMBOLS))
+    parser.add_argument("--timeframes", default="1h,1d")
+    parser.add_argument("--limit", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--n-jobs", type=int, default=None, help="RandomForest threads per worker")
+    args = parser.parse_args()
+
+    start = time.time()
+    reports = train_all(
+        args.symbols.split(","), args.timeframes.split(","), args.limit, args.workers, args.n_jobs
+    )
+
+    print("\n📊 TRAINING REPORT\n")
+    for r in reports:
+        accuracy = f"{round(r['accuracy'] * 100, 2)}%" if r["accuracy"] is not None else "-"
+        print(
+            f"{r['symbol']:<12} {r['timeframe']:<4} accuracy: {accuracy:<8} "
+            f"samples: {r['n_samples']:<6} time: {r['seconds']}s {r['error'] or ''}"
+        )
+        if r["metadata_error"]:
+            print(f"{'':<17} ⚠️ model saved, metadata not stored: {r['metadata_error']}")
+    print(f"\nTrained {len(reports)} models in {round(time.time() - start, 2)}s")